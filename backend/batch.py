@@ -0,0 +1,113 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Profiles are sent to workers in chunks to amortise pickling/IPC
+BATCH_CHUNKSIZE = 32
+# Profile fields energy.profile_energy reads
+ENERGY_FIELDS = ["age", "weight", "height", "gender", "activity", "goal"]
+
+_pool = None
+_worker_recommender = None
+_worker_data_path = None
+_worker_version = None
+
+
+def _init_worker(data_path):
+    # Runs once per worker process: load the food catalogue a single time
+    global _worker_recommender, _worker_data_path, _worker_version
+    # Imported here so `import batch` stays light for the API process
+    import catalogue
+    from recommender import DietRecommender
+    _worker_data_path = data_path
+    _worker_version = catalogue.content_version(data_path)
+    _worker_recommender = DietRecommender(data_path=data_path)
+
+
+def recommend_one(job):
+    """Worker-side entry point: plan one (profile, seed, catalogue version) job.
+
+    A version of None plans on whatever catalogue the worker has loaded.
+    """
+    global _worker_recommender, _worker_version
+    profile, seed, version = job
+    if version is not None and version != _worker_version:
+        # The catalogue was reloaded since this worker started
+        import catalogue
+        from recommender import DietRecommender
+        # Label with what is on disk, which may be newer than the requested version;
+        # hashed first so a swap in between only causes another reload
+        _worker_version = catalogue.content_version(_worker_data_path)
+        _worker_recommender = DietRecommender(data_path=_worker_data_path)
+    return _worker_recommender.recommend(
+        profile['age'],
+        profile['weight'],
+        profile['height'],
+        profile['gender'],
+        profile['activity'],
+        profile['preference'],
+        profile['goal'],
+        seed=seed,
+        engine=profile.get('engine', 'greedy'),
+        nutrients=profile.get('nutrients'),
+        energy_needs=profile.get('energy_needs')
+    )
+
+
+def _recommend_or_error(job):
+    # One bad profile must not abort the rest of a streamed batch
+    try:
+        return recommend_one(job)
+    except ValueError as e:
+        return {"error": str(e)}
+
+
+def new_pool(data_path, workers):
+    """Process pool whose workers each hold their own recommender."""
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data_path,))
+
+
+def get_pool(data_path):
+    global _pool
+    if _pool is None:
+        _pool = new_pool(data_path, int(os.environ.get("BATCH_WORKERS", os.cpu_count() or 1)))
+    return _pool
+
+
+def shutdown():
+    """Stop the batch worker processes, if any were started."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def profile_seeds(seed, profiles):
+    """Per-profile seeds: the profile's own `seed` when given, else derived from the
+    request seed (None if that is unset too)."""
+    if seed is None:
+        derived = [None] * len(profiles)
+    else:
+        derived = [int(s) for s in np.random.SeedSequence(seed).generate_state(len(profiles))]
+    return [derived_seed if profile.get("seed") is None else int(profile["seed"])
+            for profile, derived_seed in zip(profiles, derived)]
+
+
+def with_energy_needs(profiles):
+    """The profiles with their (BMR, TDEE) attached, computed for all of them in one vectorised pass."""
+    import energy
+    import pandas as pd
+    needs = energy.profile_energy(pd.DataFrame(profiles, columns=ENERGY_FIELDS))
+    return [dict(profile, energy_needs=(float(b), float(t)))
+            for profile, b, t in zip(profiles, needs["BMR"], needs["TDEE"])]
+
+
+def recommend_batch(profiles, data_path, seed=None, version=None):
+    """Yield (index, seed, plan) for each profile, in input order; plan is {"error": ...} if it failed."""
+    seeds = profile_seeds(seed, profiles)
+    profiles = with_energy_needs(profiles)
+    jobs = ((profile, profile_seed, version) for profile, profile_seed in zip(profiles, seeds))
+    results = get_pool(data_path).map(_recommend_or_error, jobs, chunksize=BATCH_CHUNKSIZE)
+    for i, (profile_seed, plan) in enumerate(zip(seeds, results)):
+        yield i, profile_seed, plan
@@ -0,0 +1,265 @@
+"""Reproducible benchmarks for the recommender and the ingest pipeline.
+
+Run from backend/:
+
+    python benchmark.py                          # everything, writes benchmark_results.json
+    python benchmark.py --only recommend micro   # selected sections
+    python benchmark.py --sizes 1000 100000      # smaller synthetic catalogues
+    python benchmark.py --compare old.json new.json
+
+All timings are wall-clock milliseconds. Every random input (profiles,
+seeds, synthetic catalogues) is derived from --seed, so two runs on two
+commits time exactly the same work.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import catalogue
+import energy
+import process_dataset
+from recommender import DietRecommender
+
+RAW_PATH = "Indian_Food_Nutrition_Processed.csv"
+PROCESSED_PATH = "food_data_processed.csv"
+CATALOGUE_PATH = "food_data_processed.catalog"
+SECTIONS = ["cold_start", "recommend", "micro", "preprocess", "api"]
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+GOALS = ["weight_loss", "maintain", "weight_gain"]
+PREFERENCES = ["Veg", "Non-Veg", "Any"]
+ENGINES = ["greedy", "optimal"]
+PROFILE = dict(age=30, weight=70.0, height=175.0, gender="Male", activity="moderate")
+
+
+def _summary(samples_ms):
+    samples = sorted(samples_ms)
+    return {
+        "n": len(samples),
+        "min_ms": round(samples[0], 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 4),
+    }
+
+
+def _time(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return _summary(samples)
+
+
+def bench_cold_start(repeat):
+    results = {}
+    for label, path, usable in [("catalogue", CATALOGUE_PATH, catalogue.is_current), ("csv", PROCESSED_PATH, os.path.exists)]:
+        if usable(path):
+            results[label] = _time(lambda: DietRecommender(data_path=path), repeat, warmup=1)
+    return results
+
+
+def bench_recommend(rec, repeat, seed):
+    results = {}
+    for engine in ENGINES:
+        for goal in GOALS:
+            for preference in PREFERENCES:
+                seeds = iter(np.random.SeedSequence([seed, len(results)]).generate_state(repeat + 1))
+                results[f"{engine}/{goal}/{preference}"] = _time(
+                    lambda: rec.recommend(PROFILE["age"], PROFILE["weight"], PROFILE["height"], PROFILE["gender"],
+                                          PROFILE["activity"], preference, goal, seed=int(next(seeds)),
+                                          engine=engine),
+                    repeat)
+    return results
+
+
+def bench_micro(rec, repeat, seed):
+    rng = np.random.default_rng(seed)
+    types = ('Veg', 'Non-Veg')
+    lunch = rec._get_meal_options("Lunch", types, None, "Any")
+    breakfast_targets = rng.uniform(250, 700, repeat + 1)
+    lunch_targets = rng.uniform(300, 900, repeat + 1)
+    results = {}
+    it = iter(lunch_targets)
+    results["_find_closest"] = _time(lambda: rec._find_closest(lunch, next(it), ['Gravy', 'Dry']), repeat)
+    it = iter(breakfast_targets)
+    results["_recommend_breakfast"] = _time(
+        lambda: rec._recommend_breakfast(next(it), types, rec.index.new_used_mask(), rng), repeat)
+    profile = [PROFILE[k] for k in ("age", "weight", "height", "gender", "activity")] + ["Non-Veg", "maintenance"]
+    plan = rec.recommend(*profile, seed=seed)["Plan"]
+    results["swap_meal"] = _time(lambda: rec.swap_meal(*profile, plan, "Lunch"), repeat)
+    n = 100_000
+    profiles = pd.DataFrame({
+        "age": rng.integers(18, 80, n), "weight": rng.uniform(45, 120, n), "height": rng.uniform(145, 200, n),
+        "gender": rng.choice(["male", "female"], n), "activity": rng.choice(list(energy.ACTIVITY_MULTIPLIERS), n),
+        "goal": rng.choice(GOALS, n),
+    })
+    results["profile_energy_100k"] = _time(lambda: energy.profile_energy(profiles), max(1, repeat // 10))
+    return results
+
+
+def synthetic_raw(source, rows, seed):
+    """`rows` raw dishes in the Kaggle CSV schema, resampled from `source` with jitter.
+
+    Each name gets a numeric suffix so every row is a distinct dish, which is
+    the worst case for classification.
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(source), rows)
+    df = source.iloc[picks].reset_index(drop=True)
+    name_col = df.columns[0]
+    df[name_col] = df[name_col].astype(str) + " " + pd.Series(np.arange(rows)).astype(str)
+    numeric = df.columns[1:]
+    df[numeric] = (df[numeric].to_numpy(dtype=float) * rng.uniform(0.8, 1.2, (rows, len(numeric)))).round(2)
+    return df
+
+
+def bench_preprocess(sizes, seed):
+    source = pd.read_csv(RAW_PATH)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            raw_path = os.path.join(tmp, f"raw_{rows}.csv")
+            synthetic_raw(source, rows, seed).to_csv(raw_path, index=False)
+            output = os.path.join(tmp, f"processed_{rows}.csv")
+            catalogue_path = os.path.join(tmp, f"processed_{rows}.catalog")
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                process_dataset.preprocess_new_dataset(raw_path, output, catalogue_path)
+            seconds = time.perf_counter() - start
+            results[str(rows)] = {"seconds": round(seconds, 4), "rows_per_s": round(rows / seconds, 1)}
+    return results
+
+
+def bench_api(requests, seed):
+    try:
+        from fastapi.testclient import TestClient
+    except (ImportError, RuntimeError) as e:
+        # TestClient needs httpx
+        return {"skipped": str(e)}
+    import main
+    # Entering the client runs the app's lifespan (catalogue load, executors)
+    with TestClient(main.app) as client:
+        return _bench_api_requests(client, requests, seed)
+
+
+def _bench_api_requests(client, requests, seed):
+    rng = np.random.default_rng(seed)
+    bodies = [
+        dict(age=int(rng.integers(18, 70)), weight=round(float(rng.uniform(45, 110)), 1),
+             height=round(float(rng.uniform(150, 195)), 1), gender=str(rng.choice(["Male", "Female"])),
+             activity=str(rng.choice(["sedentary", "light", "moderate", "active"])),
+             preference=str(rng.choice(PREFERENCES)), goal=str(rng.choice(GOALS)), seed=i)
+        for i in range(requests)
+    ]
+    client.post("/recommend", json=bodies[0])
+    samples = []
+    start = time.perf_counter()
+    for body in bodies:
+        t = time.perf_counter()
+        response = client.post("/recommend", json=body)
+        samples.append((time.perf_counter() - t) * 1000)
+        response.raise_for_status()
+    seconds = time.perf_counter() - start
+    return {"recommend": dict(_summary(samples), requests_per_s=round(requests / seconds, 1))}
+
+
+def _environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def run(sections, sizes, repeat, requests, seed):
+    results = {"environment": _environment(), "seed": seed}
+    rec = DietRecommender(data_path=CATALOGUE_PATH if catalogue.is_current(CATALOGUE_PATH) else PROCESSED_PATH)
+    for section in sections:
+        print(f"Running {section}...", file=sys.stderr)
+        if section == "cold_start":
+            results[section] = bench_cold_start(max(3, repeat // 20))
+        elif section == "recommend":
+            results[section] = bench_recommend(rec, repeat, seed)
+        elif section == "micro":
+            results[section] = bench_micro(rec, repeat * 10, seed)
+        elif section == "preprocess":
+            results[section] = bench_preprocess(sizes, seed)
+        elif section == "api":
+            results[section] = bench_api(requests, seed)
+    return results
+
+
+def _medians(results, prefix=""):
+    # Flatten to {"section/case": median_ms or seconds}
+    flat = {}
+    for key, value in results.items():
+        if key in ("environment", "seed") or not isinstance(value, dict):
+            continue
+        name = f"{prefix}{key}"
+        if "median_ms" in value:
+            flat[name] = value["median_ms"]
+        elif "seconds" in value:
+            flat[name] = value["seconds"]
+        else:
+            flat.update(_medians(value, name + "/"))
+    return flat
+
+
+def compare(old_path, new_path):
+    """Print the change in median time for every benchmark present in both files."""
+    with open(old_path) as f:
+        old = _medians(json.load(f))
+    with open(new_path) as f:
+        new = _medians(json.load(f))
+    for name in sorted(old.keys() & new.keys()):
+        ratio = new[name] / old[name] if old[name] else float("inf")
+        print(f"{name:50s} {old[name]:12.4f} {new[name]:12.4f} {ratio:7.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, default=SECTIONS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES,
+                        help="synthetic raw catalogue sizes for the preprocess benchmark")
+    parser.add_argument("--repeat", type=int, default=50, help="timed calls per recommend case")
+    parser.add_argument("--requests", type=int, default=200, help="requests for the API benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    results = run(args.only, args.sizes, args.repeat, args.requests, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
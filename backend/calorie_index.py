@@ -0,0 +1,118 @@
+from collections import namedtuple
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+import catalogue
+
+# A candidate pool: one meal type, the dish Types allowed in it, and the
+# used-dish mask to skip (None when dishes may be reused).
+MealPool = namedtuple("MealPool", ["meal_type", "types", "used"])
+
+
+class CalorieIndex:
+    """Sorted calorie arrays per (Meal_Type, Category, Type) bucket.
+
+    Built once per catalogue from its dish records (catalogue.Dishes): a
+    dish is in the bucket of every meal in its bitmask, and lookups return
+    dish positions. Nearest and k-nearest lookups are a binary search into
+    each bucket followed by a short walk outwards past dishes flagged in
+    the used mask, so no tree is fitted per request.
+    """
+
+    def __init__(self, dishes):
+        # Used dishes are tracked per unique name (identically named records share one)
+        name_codes, names = pd.factorize(dishes.names)
+        self.name_codes = name_codes
+        self.names = names
+        self.name_lookup = {name: i for i, name in enumerate(names)}
+
+        calories = np.asarray(dishes.nutrients[:, 0], dtype=float)
+        type_codes = np.asarray(dishes.type_codes, dtype=np.int64)
+        category_codes = np.asarray(dishes.category_codes, dtype=np.int64)
+        # Dishes with no Type or Category label are in no bucket
+        labelled = (type_codes >= 0) & (category_codes >= 0)
+        keys = category_codes * len(dishes.types) + type_codes
+        self.buckets = {}
+        self.categories = {}
+        for bit, meal_type in enumerate(catalogue.MEAL_TYPES):
+            in_meal = np.flatnonzero(((dishes.meals >> bit) & 1).astype(bool) & labelled)
+            meal_keys = keys[in_meal]
+            grouped = in_meal[np.argsort(meal_keys, kind='stable')]
+            unique, first, counts = np.unique(meal_keys, return_index=True, return_counts=True)
+            starts = np.cumsum(counts) - counts
+            # Buckets and categories in order of first appearance
+            for u in np.argsort(first):
+                key = int(unique[u])
+                positions = grouped[starts[u]:starts[u] + counts[u]]
+                category = dishes.categories[key // len(dishes.types)]
+                order = positions[np.argsort(calories[positions], kind='stable')]
+                self.buckets[(meal_type, category, dishes.types[key % len(dishes.types)])] = (
+                    calories[order], order, name_codes[order])
+                categories = self.categories.setdefault(meal_type, [])
+                if category not in categories:
+                    categories.append(category)
+
+    def new_used_mask(self):
+        return np.zeros(len(self.names), dtype=bool)
+
+    def mark_used(self, used, name):
+        code = self.name_lookup.get(name)
+        if code is not None:
+            used[code] = True
+
+    def _buckets(self, pool, categories):
+        if categories is None:
+            categories = self.categories.get(pool.meal_type, [])
+        for key in product([pool.meal_type], categories, pool.types):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                yield bucket
+
+    @staticmethod
+    def _skip(names, i, step, used, exclude):
+        # Walk from i in direction `step` past used/excluded dishes
+        while 0 <= i < len(names):
+            code = names[i]
+            if code != exclude and (used is None or not used[code]):
+                return i
+            i += step
+        return -1
+
+    def available(self, pool, categories=None, exclude=None):
+        for cal, rows, names in self._buckets(pool, categories):
+            if self._skip(names, 0, 1, pool.used, exclude) >= 0:
+                return True
+        return False
+
+    def nearest(self, pool, target, categories=None, exclude=None):
+        """Row position of the dish closest to `target` calories, or None."""
+        best, best_dist = None, np.inf
+        for cal, rows, names in self._buckets(pool, categories):
+            i = int(np.searchsorted(cal, target))
+            for j in (self._skip(names, i - 1, -1, pool.used, exclude),
+                      self._skip(names, i, 1, pool.used, exclude)):
+                if j >= 0 and abs(cal[j] - target) < best_dist:
+                    best, best_dist = rows[j], abs(cal[j] - target)
+        return best
+
+    def k_nearest(self, pool, target, k, categories=None, exclude=None):
+        """Row positions of up to `k` dishes closest to `target`, nearest first."""
+        found = []
+        for cal, rows, names in self._buckets(pool, categories):
+            i = int(np.searchsorted(cal, target))
+            lo = self._skip(names, i - 1, -1, pool.used, exclude)
+            hi = self._skip(names, i, 1, pool.used, exclude)
+            # Merge outwards; no bucket can contribute more than k
+            for _ in range(k):
+                if lo < 0 and hi < 0:
+                    break
+                if hi < 0 or (lo >= 0 and target - cal[lo] <= cal[hi] - target):
+                    found.append((target - cal[lo], rows[lo]))
+                    lo = self._skip(names, lo - 1, -1, pool.used, exclude)
+                else:
+                    found.append((cal[hi] - target, rows[hi]))
+                    hi = self._skip(names, hi + 1, 1, pool.used, exclude)
+        found.sort(key=lambda item: item[0])
+        return np.array([row for _, row in found[:k]], dtype=np.intp)
@@ -0,0 +1,301 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# On-disk layout of a compact food catalogue (a directory):
+#   meta.json         column names, the value tables for the coded columns and
+#                     the content hash of the raw dataset it was built from
+#   nutrients.npy     float64 (dishes x nutrients), so values read back exactly as written
+#   type.npy          uint8 code into meta["types"]
+#   category.npy      uint8 code into meta["categories"]
+#   meals.npy         uint8 bitmask over meta["meal_types"]; a Lunch/Dinner
+#                     dish is stored once with two bits set
+#   names.bin         utf-8 string table of dish names, NUL-separated
+# load_dishes() memory-maps the .npy arrays read-only, so every worker that
+# loads the same catalogue reads one page-cache copy of them; the
+# recommender works on dish positions plus the meal bitmask and never
+# expands them. load_catalogue() still returns the exploded DataFrame (one
+# row per (dish, meal)), which is a private copy.
+
+CATALOGUE_SUFFIX = ".catalog"
+# 2: float64 nutrients (1 stored float32, which shifted rounded macros)
+FORMAT_VERSION = 2
+MEAL_TYPES = ["Breakfast", "Lunch", "Dinner", "Snack", "Side"]
+MICRONUTRIENT_COLUMNS = ["Sugar", "Fibre", "Sodium", "Calcium", "Iron", "VitaminC", "Folate"]
+NUTRIENT_COLUMNS = ["Calories", "Proteins", "Fats", "Carbs"] + MICRONUTRIENT_COLUMNS
+
+
+# One record per dish, as stored in a catalogue. Type and Category are codes
+# into the `types` and `categories` tables; `meals` is the bitmask over
+# MEAL_TYPES; `nutrients` is (dishes x NUTRIENT_COLUMNS), memory-mapped
+# when loaded from a catalogue directory.
+Dishes = namedtuple("Dishes", ["names", "types", "type_codes", "categories", "category_codes", "meals", "nutrients"])
+
+
+def is_catalogue(path):
+    return str(path).endswith(CATALOGUE_SUFFIX) or os.path.isdir(path)
+
+
+# Rows copied per step when turning the append-only files into .npy arrays
+_COPY_ROWS = 1 << 20
+
+
+def _collapse(df, nutrients):
+    """One record per dish of an exploded frame, in first-seen order, plus its meal bitmask."""
+    dish_cols = ["Name", "Type", "Category"] + nutrients
+    dish_codes = df.groupby(dish_cols, sort=False, dropna=False, observed=True).ngroup().to_numpy()
+    dishes = df.drop_duplicates(subset=dish_cols)[dish_cols].reset_index(drop=True)
+
+    meal_bits = df['Meal_Type'].map({m: 1 << i for i, m in enumerate(MEAL_TYPES)})
+    if meal_bits.isna().any():
+        raise ValueError(f"Unknown Meal_Type values: {sorted(df.loc[meal_bits.isna(), 'Meal_Type'].unique())}")
+    meals = np.zeros(len(dishes), dtype=np.uint8)
+    np.bitwise_or.at(meals, dish_codes, meal_bits.to_numpy(dtype=np.uint8))
+    return dishes, meals
+
+
+class CatalogueWriter:
+    """Builds a catalogue directory from processed rows appended in chunks.
+
+    Each chunk is collapsed to one record per dish and appended to flat
+    files in a sibling temp dir, so memory stays bounded by the chunk size.
+    close() converts them to the on-disk layout and swaps the directory
+    into place; abort() (or an exception inside a with-block) discards it.
+    Identical dishes are merged within a chunk, not across chunks.
+    """
+
+    def __init__(self, path, source=None):
+        self.path = path
+        # process_dataset.content_hash of the raw dataset, when built from one
+        self.source = source
+        parent = os.path.dirname(os.path.abspath(path))
+        self.tmp = tempfile.mkdtemp(dir=parent, prefix=".catalog-")
+        self.dishes = 0
+        # Nutrient columns of the first chunk; older processed files only have the macros
+        self.nutrients = None
+        self.types = {}
+        self.categories = {}
+        self._files = {name: open(os.path.join(self.tmp, name), "wb")
+                       for name in ["nutrients.raw", "type.raw", "category.raw", "meals.raw", "names.bin"]}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    @staticmethod
+    def _codes(values, table):
+        # Codes in first-seen order; close() renumbers them to sorted order
+        for value in pd.unique(values):
+            table.setdefault(value, len(table))
+        if len(table) > 256:
+            raise ValueError("Too many distinct values for a uint8 column")
+        return values.map(table).to_numpy(dtype=np.uint8)
+
+    def append(self, df):
+        """Append a processed (exploded) food DataFrame chunk."""
+        if self.nutrients is None:
+            self.nutrients = [col for col in NUTRIENT_COLUMNS if col in df.columns]
+        dishes, meals = _collapse(df, self.nutrients)
+
+        # A missing name is stored as "nan", as str() of it reads
+        names = dishes['Name'].fillna("nan").astype(str)
+        if names.str.contains("\0", regex=False).any():
+            raise ValueError("Dish names must not contain NUL characters")
+        if not len(dishes):
+            return
+
+        files = self._files
+        files["nutrients.raw"].write(dishes[self.nutrients].to_numpy(dtype=np.float64).tobytes())
+        files["type.raw"].write(self._codes(dishes['Type'], self.types).tobytes())
+        files["category.raw"].write(self._codes(dishes['Category'], self.categories).tobytes())
+        files["meals.raw"].write(meals.tobytes())
+        files["names.bin"].write((("\0" if self.dishes else "") + "\0".join(names)).encode("utf-8"))
+        self.dishes += len(dishes)
+
+    def _to_npy(self, raw_name, npy_name, dtype, shape, remap=None):
+        raw_path = os.path.join(self.tmp, raw_name)
+        out = np.lib.format.open_memmap(os.path.join(self.tmp, npy_name), mode="w+", dtype=dtype, shape=shape)
+        if self.dishes:
+            src = np.memmap(raw_path, dtype=dtype, mode="r", shape=shape)
+            for start in range(0, self.dishes, _COPY_ROWS):
+                block = src[start:start + _COPY_ROWS]
+                out[start:start + _COPY_ROWS] = remap[block] if remap is not None else block
+            del src
+        out.flush()
+        del out
+        os.remove(raw_path)
+
+    @staticmethod
+    def _sorted_table(table):
+        # Sorted value table plus the old-code -> new-code lookup
+        values = sorted(table)
+        remap = np.zeros(max(len(table), 1), dtype=np.uint8)
+        for value, code in table.items():
+            remap[code] = values.index(value)
+        return values, remap
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        if self.nutrients is None:
+            self.nutrients = list(NUTRIENT_COLUMNS)
+        try:
+            types, type_remap = self._sorted_table(self.types)
+            categories, category_remap = self._sorted_table(self.categories)
+            self._to_npy("nutrients.raw", "nutrients.npy", np.float64, (self.dishes, len(self.nutrients)))
+            self._to_npy("type.raw", "type.npy", np.uint8, (self.dishes,), type_remap)
+            self._to_npy("category.raw", "category.npy", np.uint8, (self.dishes,), category_remap)
+            self._to_npy("meals.raw", "meals.npy", np.uint8, (self.dishes,))
+            meta = {
+                "version": FORMAT_VERSION,
+                "dishes": self.dishes,
+                "nutrients": self.nutrients,
+                "types": types,
+                "categories": categories,
+                "meal_types": MEAL_TYPES,
+                "source": self.source,
+            }
+            with open(os.path.join(self.tmp, "meta.json"), "w") as f:
+                json.dump(meta, f, indent=2)
+            # Move any previous catalogue aside first so the swap is two renames
+            old = None
+            if os.path.isdir(self.path):
+                old = self.tmp + ".old"
+                os.replace(self.path, old)
+            os.replace(self.tmp, self.path)
+            if old:
+                shutil.rmtree(old, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(self.tmp, ignore_errors=True)
+            raise
+
+    def abort(self):
+        for f in self._files.values():
+            f.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+def write_catalogue(df, path, source=None):
+    """Write a processed (exploded) food DataFrame as a compact catalogue directory.
+
+    `source` is the process_dataset.content_hash of the raw dataset `df` was built from.
+    """
+    # Build in a sibling temp dir and rename into place so readers never see a partial catalogue
+    with CatalogueWriter(path, source) as writer:
+        writer.append(df)
+
+
+def content_version(path):
+    """Short hash of a catalogue's bytes: a catalogue directory or a processed CSV.
+
+    The same data gives the same version in every process and across
+    restarts, so caches shared between workers can be keyed on it.
+    """
+    if os.path.isdir(path):
+        files = sorted(os.listdir(path))
+        paths = [os.path.join(path, name) for name in files]
+    else:
+        files, paths = [os.path.basename(path)], [path]
+    digest = hashlib.sha256()
+    for name, file_path in zip(files, paths):
+        digest.update(name.encode("utf-8") + b"\0")
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def is_current(path):
+    """True if `path` is a catalogue directory in this FORMAT_VERSION."""
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            return json.load(f).get("version") == FORMAT_VERSION
+    except (FileNotFoundError, NotADirectoryError):
+        return False
+
+
+def catalogue_source(path):
+    """Content hash of the raw dataset a catalogue was built from, or None if unknown."""
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            return json.load(f).get("source")
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def dishes_from_frame(df):
+    """Dishes of a processed (exploded) food DataFrame, merged the way a catalogue stores them.
+
+    Nutrients stay float64 and missing micronutrient columns are zeros.
+    """
+    dishes, meals = _collapse(df, [col for col in NUTRIENT_COLUMNS if col in df.columns])
+    type_codes, types = pd.factorize(dishes['Type'], sort=True)
+    category_codes, categories = pd.factorize(dishes['Category'], sort=True)
+    nutrients = np.zeros((len(dishes), len(NUTRIENT_COLUMNS)))
+    for j, col in enumerate(NUTRIENT_COLUMNS):
+        if col in dishes:
+            nutrients[:, j] = dishes[col].to_numpy(dtype=float)
+    return Dishes(dishes['Name'].to_numpy(dtype=object), list(types), type_codes,
+                  list(categories), category_codes, meals, nutrients)
+
+
+def load_dishes(path):
+    """Dishes of a catalogue directory, with its arrays memory-mapped read-only."""
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta["version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported catalogue version {meta['version']} in {path}")
+    if meta["meal_types"] != MEAL_TYPES:
+        raise ValueError(f"Unsupported meal types {meta['meal_types']} in {path}")
+
+    def load(name):
+        return np.load(os.path.join(path, name), mmap_mode="r")
+
+    nutrients = load("nutrients.npy")
+    if meta["nutrients"] != NUTRIENT_COLUMNS:
+        # Older catalogues only have the macros: a private copy padded with zeros
+        padded = np.zeros((meta["dishes"], len(NUTRIENT_COLUMNS)))
+        for j, col in enumerate(meta["nutrients"]):
+            padded[:, NUTRIENT_COLUMNS.index(col)] = nutrients[:, j]
+        nutrients = padded
+    with open(os.path.join(path, "names.bin"), "rb") as f:
+        blob = f.read().decode("utf-8")
+    names = np.array(blob.split("\0") if meta["dishes"] else [], dtype=object)
+    if len(names) != meta["dishes"]:
+        raise ValueError(f"Corrupt name table in {path}")
+    return Dishes(names, meta["types"], load("type.npy"), meta["categories"], load("category.npy"),
+                  load("meals.npy"), nutrients)
+
+
+def explode_dishes(dishes):
+    """The exploded food DataFrame: one row per (dish, meal), dish order first."""
+    bits = (dishes.meals[:, None] >> np.arange(len(MEAL_TYPES), dtype=np.uint8)) & 1
+    row_dish, row_meal = np.nonzero(bits)
+
+    df = pd.DataFrame({
+        "Name": dishes.names[row_dish],
+        "Type": pd.Categorical.from_codes(dishes.type_codes[row_dish], dishes.types),
+    })
+    for j, col in enumerate(NUTRIENT_COLUMNS):
+        df[col] = dishes.nutrients[row_dish, j]
+    df["Meal_Type"] = pd.Categorical.from_codes(row_meal.astype(np.int8), MEAL_TYPES)
+    df["Category"] = pd.Categorical.from_codes(dishes.category_codes[row_dish], dishes.categories)
+    return df
+
+
+def load_catalogue(path):
+    """Read a catalogue directory and return the exploded food DataFrame."""
+    return explode_dishes(load_dishes(path))
@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import catalogue
+import process_dataset
+from recommender import DietRecommender
+
+# One immutable view of the catalogue; version is catalogue.content_version
+# of the files it was loaded from, the same in every worker and across restarts
+Snapshot = namedtuple("Snapshot", ["version", "recommender"])
+
+LABEL_COLS = process_dataset.LABEL_COLS
+
+
+def _signature(path):
+    # Both writers replace the file or directory by rename, so a new inode means new data
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns
+
+
+class CatalogueStore:
+    """Holds the live recommender snapshot and rebuilds it when the raw dataset changes.
+
+    Requests read `store.current` once and keep that snapshot for their
+    whole run. A reload builds the next snapshot on the side and swaps it
+    in with a single attribute assignment, so in-flight calls finish on
+    the old one. reload() runs in the one worker that got the request;
+    watch() lets every other worker pick up the files it wrote.
+    """
+
+    def __init__(self, raw_path, processed_path, catalogue_path, data_path):
+        self.raw_path = raw_path
+        self.processed_path = processed_path
+        self.catalogue_path = catalogue_path
+        self.data_path = data_path
+        self._reload_lock = threading.Lock()
+        # process_dataset.content_hash of the raw file the served data was built
+        # from (None when unknown, e.g. a CSV-only setup or an older catalogue)
+        self._source = self._served_source()
+        # Classification of every raw row seen so far, keyed by row content hash
+        self._labels = None
+        if os.path.exists(raw_path) and self._source == process_dataset.content_hash(raw_path):
+            # Cached artifact: no classification at boot unless the raw file changed.
+            # A raw file edited since the data was built leaves this unset, so the
+            # next reload rebuilds from every row
+            classified = process_dataset.classify_cached(raw_path)
+            raw = classified.drop(columns=LABEL_COLS)
+            self._labels = self._label_table(process_dataset.row_hashes(raw),
+                                             [classified[col].to_numpy() for col in LABEL_COLS])
+        self._signature = _signature(data_path)
+        self.current = Snapshot(catalogue.content_version(data_path), DietRecommender(data_path=data_path))
+
+    def _served_source(self):
+        return catalogue.catalogue_source(self.data_path) if catalogue.is_catalogue(self.data_path) else None
+
+    @staticmethod
+    def _label_table(hashes, labels):
+        table = pd.DataFrame(dict(zip(LABEL_COLS, labels)), index=hashes)
+        return table[~table.index.duplicated()]
+
+    def reload(self):
+        """Reclassify only new or edited raw rows and publish the next snapshot.
+
+        Rows are compared with the raw file the served data was built from,
+        so edits made while the API was down are picked up too.
+        """
+        with self._reload_lock:
+            source = process_dataset.content_hash(self.raw_path)
+            raw = process_dataset.load_raw(self.raw_path)
+            hashes = process_dataset.row_hashes(raw)
+
+            labels = [np.empty(len(raw), dtype=object) for _ in LABEL_COLS]
+            known = np.zeros(len(raw), dtype=bool)
+            removed = 0
+            if self._labels is not None:
+                known = np.isin(hashes, self._labels.index)
+                removed = int((~self._labels.index.isin(hashes)).sum())
+                previous = self._labels.loc[hashes[known], LABEL_COLS]
+                for col, values in zip(labels, previous.to_numpy().T):
+                    col[known] = values
+
+            changed = ~known
+            if not changed.any() and removed == 0 and source == self._source:
+                return {"version": self.current.version, "rows": len(raw), "reclassified": 0, "removed": 0}
+
+            if changed.any():
+                for col, values in zip(labels, process_dataset.classify_dishes(raw.loc[changed, 'Name'])):
+                    col[changed] = values
+
+            classified = raw.assign(**dict(zip(LABEL_COLS, labels)))
+            processed = process_dataset.finalize(classified)
+            process_dataset.write_classified_artifact(self.raw_path, classified)
+
+            # Persist so restarts, batch workers and the other API workers pick up the same data;
+            # written aside and renamed so a watching worker never reads a partial file
+            tmp = f"{self.processed_path}.{os.getpid()}.tmp"
+            processed.to_csv(tmp, index=False)
+            os.replace(tmp, self.processed_path)
+            if self.catalogue_path:
+                catalogue.write_catalogue(processed, self.catalogue_path, source)
+                recommender = DietRecommender(data_path=self.catalogue_path)
+            else:
+                recommender = DietRecommender(df=processed)
+            version = catalogue.content_version(self.catalogue_path or self.processed_path)
+
+            self._labels = self._label_table(hashes, labels)
+            self._source = source
+            self._signature = _signature(self.data_path)
+            self.current = Snapshot(version, recommender)
+            return {
+                "version": self.current.version,
+                "rows": len(raw),
+                "reclassified": int(changed.sum()),
+                "removed": removed,
+            }
+
+    def refresh(self):
+        """Load the data files again if another process rewrote them; True if the snapshot changed."""
+        with self._reload_lock:
+            signature = _signature(self.data_path)
+            if signature == self._signature:
+                return False
+            version = catalogue.content_version(self.data_path)
+            changed = version != self.current.version
+            if changed:
+                self.current = Snapshot(version, DietRecommender(data_path=self.data_path))
+                # Another worker's reload; the labels stay valid as a classification cache
+                self._source = self._served_source()
+            self._signature = signature
+            return changed
+
+    def watch(self, interval):
+        """refresh() every `interval` seconds from a daemon thread."""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.refresh():
+                        print(f"Catalogue reloaded from disk: version {self.current.version}")
+                except Exception as e:
+                    # E.g. caught between the two renames of a catalogue swap; try again next time
+                    print(f"Catalogue refresh failed: {e}")
+
+        threading.Thread(target=run, name="catalogue-watch", daemon=True).start()
@@ -0,0 +1,193 @@
+"""Offline plan generation for whole cohorts, with no HTTP in the way.
+
+Run from backend/:
+
+    python cohort.py profiles.csv plans/                    # all cores, Parquet parts in plans/
+    python cohort.py profiles.parquet plans/ --seed 7       # reproducible run
+    python cohort.py profiles.csv plans/ --workers 8 --part-rows 20000 --format csv
+
+Profiles carry the /recommend fields as columns (age, weight, height,
+gender, activity, preference, goal); optional `engine` and `seed` columns
+override the run's settings row by row. Every --part-rows profiles of the
+input become one output part, planned and written by one worker under a
+temporary name and renamed into place when complete. Rerunning the same
+command after an interruption skips the parts that already exist.
+Parquet input or output needs pyarrow.
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+import batch
+import catalogue
+
+DEFAULT_PART_ROWS = 10_000
+PROFILE_COLUMNS = ["age", "weight", "height", "gender", "activity", "preference", "goal"]
+MEALS = ["Breakfast", "Lunch", "Dinner", "Snack"]
+MEAL_FIELDS = ["Name", "Calories", "Proteins", "Fats", "Carbs"]
+FORMATS = ["parquet", "csv"]
+# recommender.ENGINES, without importing the recommender in the parent process
+ENGINES = ["greedy", "optimal"]
+# Run settings, checked on resume so parts from different runs never mix
+SETTINGS_FILE = "_cohort.json"
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise SystemExit("Parquet input/output needs pyarrow (pip install pyarrow), or use CSV")
+
+
+def read_profiles(input_path, part_rows=DEFAULT_PART_ROWS):
+    """Yield the input's profiles as frames of at most `part_rows` rows, in file order."""
+    if input_path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for record_batch in pq.ParquetFile(input_path).iter_batches(batch_size=part_rows):
+            yield record_batch.to_pandas()
+    else:
+        yield from pd.read_csv(input_path, chunksize=part_rows)
+
+
+def plan_record(plan):
+    """One recommend() result as a flat row: scores, then name and macros per meal."""
+    record = {key: plan[key] for key in ["Seed", "Engine", "BMR", "TDEE", "TotalCalories", "Accuracy", "Precision"]}
+    for meal in MEALS:
+        dish = plan["Plan"].get(meal) or {}
+        for field in MEAL_FIELDS:
+            record[f"{meal}_{field}"] = dish.get(field)
+    return record
+
+
+def _plan_frame(frame, plans):
+    plans = pd.DataFrame([plan_record(plan) for plan in plans], index=frame.index)
+    # Same dtypes in every part, even where a meal is missing
+    numeric = [f"{meal}_{field}" for meal in MEALS for field in MEAL_FIELDS[1:]]
+    plans[numeric] = plans[numeric].astype(float)
+    plans["Seed"] = plans["Seed"].astype(np.int64)
+    return pd.concat([frame, plans], axis=1)
+
+
+def _plan_part(task):
+    # Worker side: plan and write one part; runs in a batch pool worker
+    path, frame, seeds, engine, fmt = task
+    start = time.perf_counter()
+    profiles = batch.with_energy_needs(frame[PROFILE_COLUMNS].to_dict("records"))
+    engines = frame["engine"].fillna(engine) if "engine" in frame else [engine] * len(frame)
+    plans = [batch.recommend_one((dict(profile, engine=profile_engine), seed, None))
+             for profile, profile_engine, seed in zip(profiles, engines, seeds)]
+    out = _plan_frame(frame, plans)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if fmt == "parquet":
+        out.to_parquet(tmp, index=False)
+    else:
+        out.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    return len(out), time.perf_counter() - start
+
+
+def part_seeds(frame, run_seed, part):
+    """Per-row seeds: the row's own `seed` when given, else derived from the run seed and part number."""
+    seeds = np.random.SeedSequence([run_seed, part]).generate_state(len(frame)).astype(np.int64)
+    if "seed" in frame:
+        own = frame["seed"].to_numpy()
+        given = ~pd.isna(own)
+        seeds[given] = own[given].astype(np.int64)
+    return [int(s) for s in seeds]
+
+
+def _settings(output_dir, settings):
+    """The run's settings, reusing the stored seed on resume; refuses mismatched settings."""
+    path = os.path.join(output_dir, SETTINGS_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            stored = json.load(f)
+        if settings["seed"] is None:
+            settings["seed"] = stored["seed"]
+        changed = sorted(key for key in settings if stored.get(key) != settings[key])
+        if changed:
+            raise SystemExit(f"{output_dir} holds a run with different {', '.join(changed)}; "
+                             "use a new output directory")
+        return settings
+    if settings["seed"] is None:
+        settings["seed"] = int(np.random.SeedSequence().generate_state(1)[0])
+    with open(path, "w") as f:
+        json.dump(settings, f, indent=2)
+    return settings
+
+
+def run(input_path, output_dir, data_path, workers=None, part_rows=DEFAULT_PART_ROWS, seed=None,
+        engine="greedy", fmt="parquet"):
+    """Plan every profile in `input_path` into parts under `output_dir`; returns the number planned."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+    if fmt == "parquet" or input_path.endswith(".parquet"):
+        _require_pyarrow()
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    settings = _settings(output_dir, {"input": os.path.abspath(input_path), "data_path": data_path,
+                                      "part_rows": part_rows, "seed": seed, "engine": engine, "format": fmt})
+    # Leftovers of parts that were being written when a previous run stopped
+    for name in os.listdir(output_dir):
+        if name.endswith(".tmp"):
+            os.remove(os.path.join(output_dir, name))
+
+    print(f"Planning {input_path} with {workers} workers (seed {settings['seed']})...")
+    start = time.perf_counter()
+    planned = skipped = 0
+    pending = deque()
+
+    def finish(part, future):
+        nonlocal planned
+        rows, seconds = future.result()
+        planned += rows
+        rate = planned / (time.perf_counter() - start)
+        print(f"part {part}: {rows} plans in {seconds:.1f}s, {planned} so far ({rate:.0f} plans/s)")
+
+    pool = batch.new_pool(data_path, workers)
+    try:
+        for part, frame in enumerate(read_profiles(input_path, part_rows)):
+            if part == 0:
+                missing = [col for col in PROFILE_COLUMNS if col not in frame]
+                if missing:
+                    raise SystemExit(f"{input_path} is missing profile columns: {missing}")
+            path = os.path.join(output_dir, f"part-{part:05d}.{fmt}")
+            if os.path.exists(path):
+                skipped += 1
+                continue
+            seeds = part_seeds(frame, settings["seed"], part)
+            pending.append((part, pool.submit(_plan_part, (path, frame, seeds, engine, fmt))))
+            # At most two parts per worker read ahead, so memory stays bounded
+            if len(pending) >= 2 * workers:
+                finish(*pending.popleft())
+        while pending:
+            finish(*pending.popleft())
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    print(f"Planned {planned} profiles in {elapsed:.1f}s ({planned / max(elapsed, 1e-9):.0f} plans/s), "
+          f"{skipped} parts already done. Done!")
+    return planned
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate meal plans for a cohort of profiles, offline.")
+    parser.add_argument("input", help="profiles as .csv or .parquet")
+    parser.add_argument("output", help="directory for the plan parts (resumes if it exists)")
+    parser.add_argument("--data", default=None,
+                        help="food catalogue (default: food_data_processed.catalog, else the processed CSV)")
+    parser.add_argument("--workers", type=int, default=None, help="planning processes (default: all cores)")
+    parser.add_argument("--part-rows", type=int, default=DEFAULT_PART_ROWS, help="profiles per output part")
+    parser.add_argument("--seed", type=int, default=None, help="run seed (default: random, kept for resumes)")
+    parser.add_argument("--engine", choices=ENGINES, default="greedy", help="'greedy' or 'optimal', unless a row says otherwise")
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    args = parser.parse_args()
+    data_path = args.data or ("food_data_processed.catalog" if catalogue.is_current("food_data_processed.catalog")
+                              else "food_data_processed.csv")
+    run(args.input, args.output, data_path, args.workers, args.part_rows, args.seed, args.engine, args.format)
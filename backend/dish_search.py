@@ -0,0 +1,117 @@
+import re
+
+import numpy as np
+
+import catalogue
+
+DEFAULT_LIMIT = 10
+_SEPARATORS = re.compile(r"[\W_]+")
+# Dice similarity below which a dish is not returned
+MIN_SCORE = 0.2
+
+
+def normalize(name):
+    """Lowercase, with every run of non-alphanumerics collapsed to one space."""
+    return _SEPARATORS.sub(" ", str(name).lower()).strip()
+
+
+def _sorted_unique(values):
+    # Sort-based unique: much faster than np.unique's hash path for large int arrays
+    values = np.sort(values)
+    return values[np.r_[True, values[1:] != values[:-1]]] if len(values) else values
+
+
+class DishSearchIndex:
+    """Character-trigram inverted index over the unique dish names of a catalogue.
+
+    Names are padded like pg_trgm ("  name ") so prefixes weigh more. The
+    postings are one CSR layout: sorted trigram ids, offsets into a flat
+    array of name codes. A query gathers the postings of its trigrams,
+    counts shared trigrams per name with one bincount and ranks by Dice
+    similarity, so misspellings ("panner butter masla") still match.
+    """
+
+    def __init__(self, dishes, name_codes, names):
+        self.names = names
+        n = len(names)
+
+        # Per-name attributes for filtering and results (first dish of each name)
+        first_row = np.full(n, len(name_codes), dtype=np.int64)
+        np.minimum.at(first_row, name_codes, np.arange(len(name_codes)))
+        self.first_row = first_row
+        # Code -1 (no Type) picks the trailing "nan"
+        self.types = np.array([str(t) for t in dishes.types] + ["nan"])[np.asarray(dishes.type_codes)[first_row]]
+        self.meal_bits = np.zeros(n, dtype=np.uint8)
+        np.bitwise_or.at(self.meal_bits, name_codes, np.asarray(dishes.meals, dtype=np.uint8))
+
+        padded = [f"  {normalize(name)} " for name in names]
+        lengths = np.fromiter(map(len, padded), dtype=np.int64, count=n)
+        text = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32)
+        self.alphabet, chars = np.unique(text, return_inverse=True)
+        width = max(len(self.alphabet), 1)
+
+        # Trigram id at every position that starts a full trigram inside its own name
+        owner = np.repeat(np.arange(n), lengths)
+        offset = np.arange(len(text)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        valid = offset <= lengths[owner] - 3
+        starts = np.flatnonzero(valid)
+        grams = (chars[starts] * width + chars[starts + 1]) * width + chars[starts + 2]
+        pairs = _sorted_unique(grams.astype(np.int64) * max(n, 1) + owner[starts])
+        grams, owners = pairs // max(n, 1), pairs % max(n, 1)
+
+        self.width = width
+        first = np.flatnonzero(np.r_[True, grams[1:] != grams[:-1]]) if len(grams) else np.zeros(0, dtype=np.int64)
+        self.keys = grams[first]
+        self.offsets = np.append(first, len(grams))
+        self.postings = owners
+        self.gram_counts = np.bincount(owners, minlength=n)
+
+    def _query_grams(self, query):
+        padded = f"  {normalize(query)} "
+        text = np.frombuffer(padded.encode("utf-32-le"), dtype=np.uint32)
+        chars = np.searchsorted(self.alphabet, text)
+        known = (chars < len(self.alphabet)) & (self.alphabet[np.minimum(chars, len(self.alphabet) - 1)] == text)
+        # Trigrams with a character never seen in the catalogue cannot match
+        ok = known[:-2] & known[1:-1] & known[2:]
+        grams = (chars[:-2] * self.width + chars[1:-1]) * self.width + chars[2:]
+        distinct = len({padded[i:i + 3] for i in range(len(padded) - 2)})
+        return np.unique(grams[ok]), distinct
+
+    def search(self, query, limit=DEFAULT_LIMIT, dish_type=None, meal_type=None):
+        """Up to `limit` (name code, score) pairs, best first."""
+        if not len(self.names) or not len(self.alphabet):
+            return []
+        grams, total = self._query_grams(query)
+        if total == 0:
+            return []
+        slots = np.searchsorted(self.keys, grams)
+        slots = slots[(slots < len(self.keys)) & (self.keys[np.minimum(slots, len(self.keys) - 1)] == grams)]
+        if not len(slots):
+            return []
+        hits = np.concatenate([self.postings[self.offsets[s]:self.offsets[s + 1]] for s in slots])
+        counts = np.bincount(hits, minlength=len(self.names))
+        # Dice >= MIN_SCORE needs at least this many shared trigrams, whatever the name length
+        codes = np.flatnonzero(counts >= max(1, int(np.ceil(MIN_SCORE * total / (2 - MIN_SCORE)))))
+        shared = counts[codes]
+
+        keep = np.ones(len(codes), dtype=bool)
+        if dish_type is not None:
+            keep &= self.types[codes] == dish_type
+        if meal_type is not None:
+            bit = 1 << catalogue.MEAL_TYPES.index(meal_type) if meal_type in catalogue.MEAL_TYPES else 0
+            keep &= (self.meal_bits[codes] & bit) > 0
+        codes, shared = codes[keep], shared[keep]
+
+        scores = 2 * shared / (total + self.gram_counts[codes])
+        good = scores >= MIN_SCORE
+        codes, scores = codes[good], scores[good]
+        if len(codes) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            codes, scores = codes[top], scores[top]
+        # Best score first; shorter names win ties
+        order = np.lexsort((self.gram_counts[codes], -scores))
+        return [(int(codes[i]), float(scores[i])) for i in order]
+
+    def meal_types(self, code):
+        bits = int(self.meal_bits[code])
+        return [m for i, m in enumerate(catalogue.MEAL_TYPES) if bits & (1 << i)]
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# Energy needs (BMR, TDEE, per-meal calorie targets) for one profile or
+# millions. Every function takes scalars, NumPy arrays or pandas Series;
+# labels (gender, activity, goal) may be plain strings or categoricals and
+# are looked up once per distinct value. The arithmetic is the same float
+# operations in the same order as for a single profile, so array results
+# match the scalar ones exactly.
+
+ACTIVITY_MULTIPLIERS = {
+    "sedentary": 1.2, "light": 1.375, "moderate": 1.55,
+    "active": 1.725, "extra_active": 1.9
+}
+# Multiplier for an unknown activity level
+DEFAULT_MULTIPLIER = 1.2
+# Share of the day's calories per meal
+MEAL_SHARES = {"Breakfast": 0.25, "Lunch": 0.35, "Dinner": 0.30, "Snack": 0.10}
+MIN_CALORIES = 1200
+# Goal label -> adjustment applied in tdee()
+_GOALS = {"weight_loss": 1, "weight_gain": 2}
+
+
+# Scalar inputs stay plain Python numbers: ufuncs (and even np.ndim) on
+# scalars cost microseconds, which the single-request path would pay on
+# every call
+_SCALAR_TYPES = (int, float, str, np.generic, type(None))
+
+
+def _is_scalar(value):
+    return isinstance(value, _SCALAR_TYPES) or np.ndim(value) == 0
+
+
+def _where(cond, a, b):
+    if _is_scalar(cond):
+        return a if cond else b
+    return np.where(cond, a, b)
+
+
+def _maximum(a, b):
+    if _is_scalar(a) and _is_scalar(b):
+        return max(a, b)
+    return np.maximum(a, b)
+
+
+def _lookup(labels, fn):
+    """fn(label) for each label: computed once per distinct label, then gathered by code."""
+    if _is_scalar(labels):
+        return fn(labels)
+    cat = pd.Categorical(labels)
+    table = np.array([fn(label) for label in cat.categories] + [fn(None)])
+    # Missing labels have code -1, the last table entry
+    return table[cat.codes]
+
+
+def _is_male(gender):
+    return isinstance(gender, str) and gender.lower() == 'male'
+
+
+def bmr(weight, height, age, gender):
+    """Mifflin-St Jeor basal metabolic rate (kcal/day)."""
+    base = (10 * weight) + (6.25 * height) - (5 * age)
+    return _where(_lookup(gender, _is_male), base + 5, base - 161)
+
+
+def tdee(bmr, activity_level, goal):
+    """Daily calorie target: BMR times the activity multiplier, adjusted for the goal."""
+    tdee = bmr * _lookup(activity_level, lambda a: ACTIVITY_MULTIPLIERS.get(a, DEFAULT_MULTIPLIER))
+    # Weight loss: 500 below, but not under BMR - 100 when that cuts below BMR
+    target = tdee - 500
+    loss = _where(target < bmr, _maximum(bmr - 100, target), target)
+    goal = _lookup(goal, lambda g: _GOALS.get(g, 0))
+    tdee = _where(goal == 1, loss, _where(goal == 2, tdee + 300, tdee))
+    return _maximum(MIN_CALORIES, tdee)
+
+
+def meal_targets(tdee):
+    """{meal: calorie target}, each a scalar or an array like `tdee`."""
+    return {meal: tdee * share for meal, share in MEAL_SHARES.items()}
+
+
+def profile_energy(profiles):
+    """BMR, TDEE and per-meal target columns for a DataFrame of profiles (API field names)."""
+    b = bmr(profiles['weight'].to_numpy(dtype=float), profiles['height'].to_numpy(dtype=float),
+            profiles['age'].to_numpy(dtype=float), profiles['gender'])
+    t = tdee(b, profiles['activity'], profiles['goal'])
+    return pd.DataFrame({"BMR": b, "TDEE": t, **meal_targets(t)}, index=profiles.index)
@@ -1,10 +1,117 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from recommender import DietRecommender
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from fastapi.middleware.cors import CORSMiddleware
+import metrics
+import plan_cache
+import plan_tokens
+import serving
+import asyncio
+import gc
+import json
 import os
+import time
 
-app = FastAPI()
+RAW_PATH = "Indian_Food_Nutrition_Processed.csv"
+PROCESSED_PATH = "food_data_processed.csv"
+CATALOGUE_PATH = "food_data_processed.catalog"
+# Shared secret for /admin routes; /admin/reload is refused while it is unset
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+# Seconds between checks for a catalogue rewritten by another worker's reload (0: off)
+CATALOGUE_WATCH_SECONDS = float(os.environ.get("CATALOGUE_WATCH_SECONDS", "5"))
+MAX_PLAN_DAYS = 90
+MAX_SEARCH_RESULTS = 50
+MAX_SWAP_OPTIONS = 10
+# recommender.ENGINES, without importing the recommender at module load
+ENGINES = ("greedy", "optimal")
+# PRELOAD=1 loads the catalogue at import time, e.g. under `gunicorn --preload`,
+# so forked workers share one copy-on-write copy of it
+PRELOAD = os.environ.get("PRELOAD", "0") == "1"
+
+# Set up by load_catalogue() and start_worker()
+DATA_PATH = None
+store = None
+cache = None
+tokens = None
+executor = None
+# Milliseconds spent in each startup phase, served at /admin/startup
+STARTUP_REPORT = {}
+
+
+def _timed_phase(name, start):
+    STARTUP_REPORT[f"{name}_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return time.perf_counter()
+
+
+def load_catalogue():
+    """Prepare the data files and build the recommender snapshot (the slow part of startup)."""
+    global DATA_PATH, store
+    t = time.perf_counter()
+    # pandas, the recommender and the catalogue code are only imported here,
+    # so importing this module (autoreload, worker boot) stays cheap
+    import pandas as pd
+    import catalogue
+    from catalogue_store import CatalogueStore
+    t = _timed_phase("imports", t)
+
+    # Ensure data exists
+    if not os.path.exists(PROCESSED_PATH):
+        # If processed file doesn't exist, try to generate it from the raw Kaggle dataset
+        if os.path.exists(RAW_PATH):
+            import process_dataset
+            process_dataset.preprocess_new_dataset(RAW_PATH, PROCESSED_PATH, CATALOGUE_PATH)
+        else:
+            pass # Handle error or fallback
+
+    # Prefer the binary catalogue: faster to read than the CSV, and memory-mapped so workers share it
+    if os.path.exists(PROCESSED_PATH) and (
+            not catalogue.is_current(CATALOGUE_PATH)
+            or os.path.getmtime(CATALOGUE_PATH) < os.path.getmtime(PROCESSED_PATH)):
+        catalogue.write_catalogue(pd.read_csv(PROCESSED_PATH), CATALOGUE_PATH)
+    t = _timed_phase("data_prep", t)
+
+    DATA_PATH = CATALOGUE_PATH if os.path.exists(CATALOGUE_PATH) else PROCESSED_PATH
+    # Versioned recommender snapshot; /admin/reload swaps in a new one
+    store = CatalogueStore(RAW_PATH, PROCESSED_PATH, CATALOGUE_PATH if DATA_PATH == CATALOGUE_PATH else None, DATA_PATH)
+    _timed_phase("recommender", t)
+
+
+def start_worker():
+    """Per-process state; never created before a fork (threads and SQLite handles do not survive it)."""
+    global cache, tokens, executor
+    t = time.perf_counter()
+    # Optional /recommend response cache (PLAN_CACHE=memory|sqlite)
+    cache = plan_cache.from_env()
+    # Plan state behind /recommend/swap (PLAN_TOKENS=memory|sqlite)
+    tokens = plan_tokens.from_env()
+    # Thread/process pools behind the async /recommend route
+    executor = serving.from_env(DATA_PATH)
+    # Follow /admin/reload calls that land on other workers
+    if CATALOGUE_WATCH_SECONDS > 0:
+        store.watch(CATALOGUE_WATCH_SECONDS)
+    _timed_phase("worker", t)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    start = time.perf_counter()
+    STARTUP_REPORT["preloaded"] = store is not None
+    if store is None:
+        load_catalogue()
+    start_worker()
+    STARTUP_REPORT["pid"] = os.getpid()
+    STARTUP_REPORT["lifespan_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    print("Startup: " + ", ".join(f"{k}={v}" for k, v in STARTUP_REPORT.items()))
+    yield
+    executor.shutdown()
+    # /recommend/batch starts its process pool on first use
+    import batch
+    batch.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -15,19 +122,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize recommender
-# Ensure data exists
-if not os.path.exists("food_data_processed.csv"):
-    # If processed file doesn't exist, try to generate it from the raw Kaggle dataset
-    if os.path.exists("Indian_Food_Nutrition_Processed.csv"):
-        import process_dataset
-        process_dataset.preprocess_new_dataset("Indian_Food_Nutrition_Processed.csv", "food_data_processed.csv")
-    else:
-        pass # Handle error or fallback
+if PRELOAD:
+    load_catalogue()
+    # Keep the loaded objects out of later GC passes, which would touch (and un-share) their pages
+    gc.freeze()
 
-recommender = DietRecommender(data_path="food_data_processed.csv")
 
 
+class NutrientConstraints(BaseModel):
+    # Daily limits; unset fields use the adult reference values in nutrition.py.
+    # Checked here so a bad batch profile is refused before its stream starts
+    min_fibre_g: Optional[float] = Field(None, ge=0)
+    min_calcium_mg: Optional[float] = Field(None, ge=0)
+    min_iron_mg: Optional[float] = Field(None, ge=0)
+    min_vitamin_c_mg: Optional[float] = Field(None, ge=0)
+    min_folate_ug: Optional[float] = Field(None, ge=0)
+    max_sodium_mg: Optional[float] = Field(None, ge=0)
+    max_sugar_g: Optional[float] = Field(None, ge=0)
 
 class UserInput(BaseModel):
     age: int
@@ -37,20 +148,200 @@ class UserInput(BaseModel):
     activity: str
     preference: str
     goal: str # Added goal field
+    engine: Literal[ENGINES] = "greedy" # "greedy" or "optimal" (whole-day solver)
+    seed: Optional[int] = Field(None, ge=0)
+    nutrients: Optional[NutrientConstraints] = None # Micronutrient-aware scoring when set
+    plan_token: bool = False # Return a PlanToken for /recommend/swap
+
+    def nutrient_limits(self):
+        return None if self.nutrients is None else self.nutrients.model_dump()
 
 @app.post("/recommend")
-def get_recommendation(user_input: UserInput):
-    plan = recommender.recommend(
+async def get_recommendation(user_input: UserInput, response: Response, x_timing: Optional[str] = Header(None)):
+    start = time.perf_counter()
+    # Per-stage timings for this request only, returned in the X-Timing header
+    timings = metrics.collect_request() if x_timing else None
+    try:
+        plan = await _recommend(user_input, response)
+    finally:
+        if metrics.is_enabled():
+            # Fixed label set: a client string never becomes a new series
+            engine = user_input.engine if user_input.engine in ENGINES else "invalid"
+            metrics.REQUESTS.observe(engine, time.perf_counter() - start)
+    if timings is not None:
+        response.headers["X-Timing"] = metrics.timing_header(timings)
+    return plan
+
+async def _recommend(user_input, response):
+    # Pin one snapshot for the whole call so a concurrent reload cannot change it
+    snapshot = store.current
+    response.headers["X-Catalogue-Version"] = str(snapshot.version)
+    profile = (
         user_input.age,
         user_input.weight,
         user_input.height,
         user_input.gender,
         user_input.activity,
         user_input.preference,
-        user_input.goal # Pass goal to recommender
+        user_input.goal, # Pass goal to recommender
     )
+
+    plan = None
+    if cache is not None:
+        profile = plan_cache.quantize_profile(*profile)
+        key = plan_cache.cache_key(profile, user_input.seed, user_input.engine, user_input.nutrient_limits())
+        plan = await _off_loop(cache.backend, cache.lookup, key, snapshot.version)
+        response.headers["X-Plan-Cache"] = "miss" if plan is None else "hit"
+    if plan is None:
+        plan = await _compute(snapshot, profile, user_input)
+        if cache is not None:
+            await _off_loop(cache.backend, cache.put, key, snapshot.version, plan)
+    if not user_input.plan_token:
+        return plan
+    # Only stored when asked for; cached plans are shared and never mutated
+    token = await _off_loop(tokens.backend, tokens.issue, snapshot.version, profile,
+                            user_input.nutrient_limits(), plan["Plan"])
+    return {**plan, "PlanToken": token}
+
+async def _off_loop(backend, fn, *args):
+    """fn(*args), on a worker thread when `backend` can block (SQLite)."""
+    if not backend.blocking:
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+async def _compute(snapshot, profile, user_input):
+    try:
+        plan = await executor.recommend(snapshot, profile, user_input.seed, user_input.engine,
+                                        user_input.nutrient_limits())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except serving.Overloaded:
+        raise HTTPException(status_code=503, detail="Too many pending requests", headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Recommendation timed out")
     return plan
 
+class RangeInput(UserInput):
+    days: int = 7
+    repeat_window: int = Field(3, ge=0, le=MAX_PLAN_DAYS) # Days before a dish may be served again
+
+@app.post("/recommend/range")
+def get_range_recommendation(range_input: RangeInput, response: Response):
+    if not 1 <= range_input.days <= MAX_PLAN_DAYS:
+        raise HTTPException(status_code=400, detail=f"days must be between 1 and {MAX_PLAN_DAYS}")
+    snapshot = store.current
+    response.headers["X-Catalogue-Version"] = str(snapshot.version)
+    try:
+        return snapshot.recommender.recommend_range(
+            range_input.age,
+            range_input.weight,
+            range_input.height,
+            range_input.gender,
+            range_input.activity,
+            range_input.preference,
+            range_input.goal,
+            days=range_input.days,
+            seed=range_input.seed,
+            engine=range_input.engine,
+            repeat_window=range_input.repeat_window,
+            nutrients=range_input.nutrient_limits()
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+class SwapInput(BaseModel):
+    token: str # PlanToken from /recommend
+    meal: str # "Breakfast", "Lunch", "Dinner" or "Snack"
+    k: int = 3 # Alternatives to return
+
+@app.post("/recommend/swap")
+def swap_meal(swap_input: SwapInput, response: Response):
+    if not 1 <= swap_input.k <= MAX_SWAP_OPTIONS:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {MAX_SWAP_OPTIONS}")
+    snapshot = store.current
+    response.headers["X-Catalogue-Version"] = str(snapshot.version)
+    state = tokens.get(swap_input.token, snapshot.version)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired plan token")
+    try:
+        # Only the one slot is searched; the rest of the stored plan sets its budget
+        return snapshot.recommender.swap_meal(*state["profile"], state["plan"], swap_input.meal, k=swap_input.k,
+                                              nutrients=state["nutrients"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+class BatchInput(BaseModel):
+    profiles: List[UserInput]
+    seed: Optional[int] = Field(None, ge=0) # Makes the whole batch reproducible
+
+@app.post("/recommend/batch")
+def get_batch_recommendations(batch_input: BatchInput):
+    import batch
+    profiles = [p.model_dump() for p in batch_input.profiles]
+    version = store.current.version
+
+    # Stream one JSON line per profile, in input order, as workers finish
+    def stream():
+        for i, seed, plan in batch.recommend_batch(profiles, DATA_PATH, batch_input.seed, version):
+            if "error" in plan:
+                # The status line is already sent: report the failure in this profile's line
+                yield json.dumps({"index": i, "seed": seed, **plan}) + "\n"
+                continue
+            # An unseeded batch still reports the seed each plan was drawn with
+            yield json.dumps({"index": i, "seed": plan["Seed"], **plan}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/dishes/search")
+def search_dishes(
+    q: str = Query(..., min_length=1, max_length=100),
+    k: int = Query(10, ge=1, le=MAX_SEARCH_RESULTS),
+    type: Optional[str] = None, # "Veg" or "Non-Veg"
+    meal_type: Optional[str] = None, # e.g. "Breakfast", "Lunch"
+):
+    # Typo-tolerant name search; results carry their full nutrient profile
+    return store.current.recommender.search_dishes(q, k, type, meal_type)
+
+@app.post("/admin/reload")
+def reload_catalogue(x_admin_token: Optional[str] = Header(None)):
+    # Rewrites the data files for every worker, so never open to anyone
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Set ADMIN_TOKEN to enable /admin/reload")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if not os.path.exists(RAW_PATH):
+        raise HTTPException(status_code=404, detail=f"{RAW_PATH} not found")
+    # Only new or edited dish rows are reclassified. This worker swaps now;
+    # the others load the rewritten files within CATALOGUE_WATCH_SECONDS
+    return store.reload()
+
+@app.get("/admin/cache")
+def cache_stats(x_admin_token: Optional[str] = Header(None)):
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+@app.get("/admin/startup")
+def startup_report(x_admin_token: Optional[str] = Header(None)):
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    return STARTUP_REPORT
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    # Prometheus text format; stage histograms stay empty unless METRICS=1
+    extra = []
+    if cache is not None:
+        stats = cache.stats()
+        extra = [
+            "# TYPE plan_cache_hits_total counter", f"plan_cache_hits_total {stats['hits']}",
+            "# TYPE plan_cache_misses_total counter", f"plan_cache_misses_total {stats['misses']}",
+            "# TYPE plan_cache_entries gauge", f"plan_cache_entries {stats['entries']}",
+        ]
+    return PlainTextResponse(metrics.render(extra), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def read_root():
     return {"message": "Smart Diet Recommender API is running"}
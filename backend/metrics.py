@@ -0,0 +1,141 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Hot-path timers for the recommender. Stages are inclusive (a stage's time
+# contains any stages nested in it) and are kept as Prometheus histograms,
+# process-wide. Collection is off unless METRICS=1 or enable() is called;
+# a request can still ask for its own timings (see collect_request), which
+# only costs a context-variable read per stage for everyone else.
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_enabled = os.environ.get("METRICS", "0").lower() in ("1", "true", "yes")
+# Per-request {stage: seconds}, set by collect_request()
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _escape(value):
+    # Label value escaping of the Prometheus text format
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    def __init__(self, name, help_text, label):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._series = {}  # label value -> [bucket counts..., sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(BUCKETS) + 1) + [0.0]
+            series[bisect_left(BUCKETS, seconds)] += 1
+            series[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for value, counts in sorted(series.items()):
+            labels = f'{self.label}="{_escape(value)}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {counts[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+STAGES = Histogram("recommend_stage_seconds", "Time spent in each recommender stage (inclusive).", "stage")
+REQUESTS = Histogram("recommend_request_seconds", "End-to-end /recommend latency, including queueing.", "engine")
+
+
+def enable(flag=True):
+    global _enabled
+    _enabled = flag
+
+
+def is_enabled():
+    return _enabled
+
+
+class _NoopStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopStage()
+
+
+class _Stage:
+    __slots__ = ("name", "timings", "start")
+
+    def __init__(self, name, timings):
+        self.name = name
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if _enabled:
+            STAGES.observe(self.name, elapsed)
+        if self.timings is not None:
+            self.timings[self.name] = self.timings.get(self.name, 0.0) + elapsed
+        return False
+
+
+def stage(name):
+    """Context manager timing one stage; a shared no-op when nothing is collecting."""
+    timings = _request_timings.get()
+    if not _enabled and timings is None:
+        return _NOOP
+    return _Stage(name, timings)
+
+
+def timed(name):
+    """Decorator form of stage()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def collect_request():
+    """Start collecting stage timings for the current request; returns the dict they go into.
+
+    The dict is shared by reference, so work handed to a thread with
+    contextvars.copy_context() still reports into it.
+    """
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def timing_header(timings):
+    # Server-Timing syntax, durations in milliseconds
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items())
+
+
+def render(extra_lines=()):
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(STAGES.render() + REQUESTS.render() + list(extra_lines)) + "\n"
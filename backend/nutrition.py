@@ -0,0 +1,106 @@
+from collections import namedtuple
+
+import numpy as np
+
+from catalogue import MICRONUTRIENT_COLUMNS
+
+# Micronutrient-aware scoring. A user's constraints become daily goals
+# (fibre, calcium, iron, vitamin C, folate: only a shortfall costs) and caps
+# (sodium, sugar: only an excess costs). Each meal is held to the share of
+# them matching its share of the day's calories, and a whole candidate set
+# is scored in one NumPy pass over its micronutrient matrix.
+
+# Constraint name -> micronutrient column
+GOALS = {
+    "min_fibre_g": "Fibre",
+    "min_calcium_mg": "Calcium",
+    "min_iron_mg": "Iron",
+    "min_vitamin_c_mg": "VitaminC",
+    "min_folate_ug": "Folate",
+}
+CAPS = {
+    "max_sodium_mg": "Sodium",
+    "max_sugar_g": "Sugar",
+}
+
+# Adult daily reference values, used for any constraint left unset
+DEFAULTS = {
+    "min_fibre_g": 30,
+    "min_calcium_mg": 1000,
+    "min_iron_mg": {"male": 8, "female": 18},
+    "min_vitamin_c_mg": {"male": 90, "female": 75},
+    "min_folate_ug": 400,
+    "max_sodium_mg": 2300,
+    # None: free sugar capped at 10% of the day's calories
+    "max_sugar_g": None,
+}
+SUGAR_ENERGY_SHARE = 0.10
+KCAL_PER_GRAM_SUGAR = 4
+
+# Cost weights: calorie miss, mean squared goal shortfall, summed squared cap excess
+W_CALORIES = 1.0
+W_GOAL = 0.5
+W_CAP = 4.0
+
+# Daily limits resolved for one request; *_cols index into MICRONUTRIENT_COLUMNS
+NutrientLimits = namedtuple("NutrientLimits", ["tdee", "goal_cols", "goals", "cap_cols", "caps", "resolved"])
+
+_COLUMN = {col: i for i, col in enumerate(MICRONUTRIENT_COLUMNS)}
+
+
+def daily_limits(constraints, tdee, gender):
+    """NutrientLimits from a user's constraint dict (missing or None values use DEFAULTS)."""
+    constraints = constraints or {}
+    unknown = set(constraints) - set(GOALS) - set(CAPS)
+    if unknown:
+        raise ValueError(f"Unknown nutrient constraints: {sorted(unknown)}")
+    sex = "male" if gender.lower() == "male" else "female"
+    resolved = {}
+    for name, default in DEFAULTS.items():
+        value = constraints.get(name)
+        if value is None:
+            value = default[sex] if isinstance(default, dict) else default
+        if value is None and name == "max_sugar_g":
+            value = tdee * SUGAR_ENERGY_SHARE / KCAL_PER_GRAM_SUGAR
+        if value < 0:
+            raise ValueError(f"{name} must not be negative")
+        resolved[name] = round(float(value), 2)
+    return NutrientLimits(
+        tdee,
+        np.array([_COLUMN[col] for col in GOALS.values()]),
+        np.array([resolved[name] for name in GOALS], dtype=float),
+        np.array([_COLUMN[col] for col in CAPS.values()]),
+        np.array([resolved[name] for name in CAPS], dtype=float),
+        resolved,
+    )
+
+
+def nutrient_costs(micros, calorie_target, limits):
+    """Goal-shortfall plus cap-excess cost for each row of a (candidates x micronutrients) matrix."""
+    share = max(calorie_target, 1.0) / limits.tdee
+    goals = limits.goals * share
+    # A zero cap tolerates nothing: any amount is a large excess
+    caps = np.maximum(limits.caps * share, 1e-6)
+    # A zero goal is always met
+    shortfall = np.clip(1 - micros[:, limits.goal_cols] / np.maximum(goals, 1e-6), 0, None) * (goals > 0)
+    excess = np.clip(micros[:, limits.cap_cols] / caps - 1, 0, None)
+    return W_GOAL * (shortfall ** 2).mean(axis=1) + W_CAP * (excess ** 2).sum(axis=1)
+
+
+def meal_costs(calories, micros, calorie_target, limits):
+    """Calorie miss plus nutrient_costs: lower is better."""
+    calorie_target = max(calorie_target, 1.0)
+    return W_CALORIES * ((calories - calorie_target) / calorie_target) ** 2 + \
+        nutrient_costs(micros, calorie_target, limits)
+
+
+def within_caps(micros, calorie_target, limits):
+    """Rows that stay under every cap for a meal worth `calorie_target` kcal."""
+    caps = limits.caps * (max(calorie_target, 1.0) / limits.tdee)
+    return (micros[:, limits.cap_cols] <= caps).all(axis=1)
+
+
+def plan_totals(recommendations):
+    """Whole-day micronutrient totals of a formatted plan."""
+    return {col: round(sum(m.get(col, 0) for m in recommendations.values() if m), 2)
+            for col in MICRONUTRIENT_COLUMNS}
@@ -0,0 +1,267 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import catalogue
+import nutrition
+
+# Whole-day planner: a multiple-choice knapsack solved by DP over the
+# running calorie total (discretised into CAL_BUCKET kcal steps). Each meal
+# slot contributes exactly one candidate meal; Lunch and Dinner are solved
+# as one stage of pairs so they never share a main dish.
+
+CAL_BUCKET = 10
+CANDIDATES_PER_POOL = 12
+DEFAULT_BUDGET_MS = 100
+
+# Share of each meal's calories per macro, and kcal per gram
+MACRO_SPLIT = {"Proteins": 0.20, "Fats": 0.30, "Carbs": 0.50}
+KCAL_PER_GRAM = {"Proteins": 4, "Fats": 9, "Carbs": 4}
+
+# Objective weights: per-meal calorie miss, per-meal macro miss, whole-day calorie miss
+W_MEAL = 1.0
+W_MACRO = 0.25
+W_DAY = 4.0
+
+STAPLE_QTYS = {
+    "Chapati": [1, 2, 3, 4],
+    "Steamed Rice (1 cup)": [0.5, 1, 1.5, 2, 2.5, 3],
+}
+STAT_KEYS = ['Calories', 'Proteins', 'Fats', 'Carbs']
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+def _check(deadline):
+    if time.perf_counter() > deadline:
+        raise _BudgetExceeded()
+
+
+# One candidate meal before formatting: main dish position, servings of it,
+# (staple name, quantity) or None, and pairing side position or None
+Candidate = namedtuple("Candidate", ["row", "servings", "staple", "side"])
+
+
+def _simple_specs(rec, meal_type, target, types, veg_preference, with_pairing, per_pool, used=None):
+    pool = rec._get_meal_options(meal_type, types, used, veg_preference)
+    if pool is None:
+        return []
+    return [Candidate(pos, 1, None, rec.pairing_map.get(rec.names[pos]) if with_pairing else None)
+            for pos in rec.index.k_nearest(pool, target, per_pool)]
+
+
+def _lunch_dinner_specs(rec, meal_type, target, types, veg_preference, per_pool, used=None):
+    pool = rec._get_meal_options(meal_type, types, used, veg_preference)
+    if pool is None:
+        return []
+    specs = []
+    # Curry + staple in every sensible quantity
+    for pos in rec.index.k_nearest(pool, target * 0.6, per_pool, ['Gravy', 'Dry']):
+        name = rec.names[pos]
+        is_rice_dish = any(x in name for x in ['Rice', 'Fish'])
+        staple_name = "Steamed Rice (1 cup)" if is_rice_dish else "Chapati"
+        specs.extend(Candidate(pos, 1, (staple_name, qty), None) for qty in STAPLE_QTYS[staple_name])
+    # Complete meals, one or two servings
+    for pos in rec.index.k_nearest(pool, target, per_pool, ['RiceSide', 'Complete']):
+        specs.append(Candidate(pos, 1, None, None))
+        specs.append(Candidate(pos, 2, None, None))
+    return specs
+
+
+def _slot_specs(rec, meal, target, types, veg_preference, per_pool, used=None):
+    if meal in ("Lunch", "Dinner"):
+        return _lunch_dinner_specs(rec, meal, target, types, veg_preference, per_pool, used)
+    return _simple_specs(rec, meal, target, types, "Any", meal == "Breakfast", per_pool, used)
+
+
+def _format(rec, spec, meal_type):
+    main = rec._row(spec.row)
+    if spec.servings != 1:
+        main['Name'] = f"{spec.servings} servings of {main['Name']}"
+        for k in catalogue.NUTRIENT_COLUMNS:
+            main[k] *= spec.servings
+    staple = None
+    if spec.staple is not None:
+        name, qty = spec.staple
+        staple = {"Name": name, "Qty": qty, "Stats": rec.staples[name]}
+    side = None if spec.side is None else rec._row(spec.side)
+    return rec._format_meal(main, staple, side, None, meal_type)
+
+
+def _spec_stats(rec, specs):
+    """Unrounded nutrient totals (catalogue.NUTRIENT_COLUMNS) of each unformatted candidate."""
+    stats = rec._nutrients_at([spec.row for spec in specs]) * np.array([[spec.servings] for spec in specs])
+    for i, spec in enumerate(specs):
+        if spec.staple is not None:
+            name, qty = spec.staple
+            # Staples carry macros only
+            stats[i, :len(STAT_KEYS)] += [qty * rec.staples[name][k] for k in STAT_KEYS]
+        if spec.side is not None:
+            stats[i] += rec._nutrients_at([spec.side])[0]
+    return stats
+
+
+def _meal_costs(stats, target, grams=None):
+    """Weighted squared relative miss of each candidate against one meal's targets.
+
+    `grams` overrides the macro targets ({macro: grams}); by default they
+    are MACRO_SPLIT of the calorie target.
+    """
+    cost = W_MEAL * ((stats[:, 0] - target) / target) ** 2
+    for j, (macro, share) in enumerate(MACRO_SPLIT.items(), start=1):
+        goal = target * share / KCAL_PER_GRAM[macro] if grams is None else grams[macro]
+        cost += W_MACRO / len(MACRO_SPLIT) * ((stats[:, j] - goal) / goal) ** 2
+    return cost
+
+
+def _stats(meals, keys=STAT_KEYS):
+    return np.array([[m[k] for k in keys] for m, _ in meals], dtype=float).reshape(len(meals), len(keys))
+
+
+def _costs(meals, stats, target, limits, grams=None):
+    cost = _meal_costs(stats, target, grams)
+    if limits is not None:
+        cost += nutrition.nutrient_costs(_stats(meals, catalogue.MICRONUTRIENT_COLUMNS), target, limits)
+    return cost
+
+
+def _solve(stages, tdee, deadline):
+    """DP over the running calorie bucket; returns one candidate index per stage."""
+    dp = np.zeros(1)
+    choices = []
+    for buckets, costs in stages:
+        # Within a stage only the cheapest candidate per calorie bucket can be optimal
+        order = np.lexsort((costs, buckets))
+        first = np.r_[True, buckets[order][1:] != buckets[order][:-1]]
+        best = order[first]
+
+        new = np.full(len(dp) + buckets.max(), np.inf)
+        arg = np.full(len(new), -1)
+        for i in best:
+            b = buckets[i]
+            cand = dp + costs[i]
+            seg = new[b:b + len(dp)]
+            better = cand < seg
+            seg[better] = cand[better]
+            arg[b:b + len(dp)][better] = i
+        choices.append((arg, buckets))
+        dp = new
+        _check(deadline)
+
+    totals = np.arange(len(dp)) * CAL_BUCKET
+    state = int(np.argmin(dp + W_DAY * ((totals - tdee) / tdee) ** 2))
+    if not np.isfinite(dp[state]):
+        return None
+    picks = []
+    for arg, buckets in reversed(choices):
+        i = arg[state]
+        picks.append(i)
+        state -= buckets[i]
+    return picks[::-1]
+
+
+def slot_candidates(rec, meal, target, types, veg_preference, per_pool=CANDIDATES_PER_POOL, used=None):
+    """Candidate meals for one slot as a list of (formatted meal, main dish name)."""
+    return [(_format(rec, spec, meal), rec.names[spec.row])
+            for spec in _slot_specs(rec, meal, target, types, veg_preference, per_pool, used)]
+
+
+def build_candidates(rec, targets, types, veg_preference, per_pool=CANDIDATES_PER_POOL):
+    """Candidate meals per slot as lists of (formatted meal, main dish name)."""
+    return {meal: slot_candidates(rec, meal, target, types, veg_preference, per_pool)
+            for meal, target in targets.items()}
+
+
+def alternatives(rec, meal, target, grams, types, veg_preference, used, k, limits=None):
+    """Up to `k` formatted meals for one slot, best first, each with a different main dish.
+
+    Candidates are scored like plan_day's meals, against a calorie target and
+    macro gram targets, but from their raw nutrient totals so only the
+    winners get formatted. Dishes flagged in the `used` mask are never offered.
+    """
+    # The planner's full pool, whatever k is, so the best alternative never depends on k
+    per_pool = max(k, CANDIDATES_PER_POOL)
+    specs = [spec for spec in _slot_specs(rec, meal, target, types, veg_preference, per_pool, used)
+             if not used[rec.index.name_codes[spec.row]]]
+    if not specs:
+        return []
+    stats = _spec_stats(rec, specs)
+    costs = _meal_costs(stats[:, :len(STAT_KEYS)], target, grams)
+    if limits is not None:
+        costs += nutrition.nutrient_costs(stats[:, len(STAT_KEYS):], target, limits)
+    # Cheapest serving of each main dish
+    best = {}
+    for i in np.argsort(costs, kind='stable'):
+        best.setdefault(rec.index.name_codes[specs[i].row], specs[i])
+        if len(best) == k:
+            break
+    return [_format(rec, spec, meal) for spec in best.values()]
+
+
+def _unblocked(rec, meals, blocked):
+    # Drop recently served dishes unless that would leave the slot empty
+    if blocked is None:
+        return meals
+    lookup = rec.index.name_lookup
+    kept = [m for m in meals if not blocked[lookup[m[1]]]]
+    return kept or meals
+
+
+def plan_day(rec, targets, tdee, types, veg_preference, budget_ms=DEFAULT_BUDGET_MS,
+             candidates=None, blocked=None, limits=None):
+    """Optimal day plan as {meal: formatted meal}, or None to fall back to greedy.
+
+    `candidates` may be shared across days (see build_candidates); `blocked`
+    is a used-dish mask of main dishes to avoid; `limits` (nutrition.NutrientLimits)
+    adds micronutrient costs to every meal. Returns None when a meal
+    has no candidates or the latency budget runs out.
+    """
+    deadline = time.perf_counter() + budget_ms / 1000
+    try:
+        if candidates is None:
+            candidates = build_candidates(rec, targets, types, veg_preference)
+        breakfast, lunch, dinner, snack = (
+            _unblocked(rec, candidates[meal], blocked) for meal in ["Breakfast", "Lunch", "Dinner", "Snack"]
+        )
+        if not (breakfast and lunch and dinner and snack):
+            return None
+        _check(deadline)
+
+        stages = []
+        for meals, meal in [(breakfast, "Breakfast"), (snack, "Snack")]:
+            stats = _stats(meals)
+            stages.append((np.rint(stats[:, 0] / CAL_BUCKET).astype(int), _costs(meals, stats, targets[meal], limits)))
+
+        # Lunch x Dinner pairs, minus those repeating a main dish
+        l_stats, d_stats = _stats(lunch), _stats(dinner)
+        li, di = np.meshgrid(np.arange(len(lunch)), np.arange(len(dinner)), indexing='ij')
+        li, di = li.ravel(), di.ravel()
+        lookup = rec.index.name_lookup
+        l_codes = np.array([lookup[name] for _, name in lunch])
+        d_codes = np.array([lookup[name] for _, name in dinner])
+        distinct = l_codes[li] != d_codes[di]
+        li, di = li[distinct], di[distinct]
+        if len(li) == 0:
+            return None
+        pair_cal = l_stats[li, 0] + d_stats[di, 0]
+        pair_cost = (_costs(lunch, l_stats, targets["Lunch"], limits)[li]
+                     + _costs(dinner, d_stats, targets["Dinner"], limits)[di])
+        stages.insert(1, (np.rint(pair_cal / CAL_BUCKET).astype(int), pair_cost))
+        _check(deadline)
+
+        picks = _solve(stages, tdee, deadline)
+    except _BudgetExceeded:
+        return None
+    if picks is None:
+        return None
+
+    b, pair, s = picks
+    return {
+        "Breakfast": breakfast[b][0],
+        "Lunch": lunch[li[pair]][0],
+        "Dinner": dinner[di[pair]][0],
+        "Snack": snack[s][0],
+    }
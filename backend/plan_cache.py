@@ -0,0 +1,189 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Optional cache of whole /recommend responses. Profiles are quantized so
+# near-identical users share one entry; the plan is then computed from the
+# quantized profile, so a hit and a miss for the same key return the same
+# plan. Every entry records the catalogue version (catalogue.content_version)
+# it was built from and only answers lookups for that same version, so a
+# changed catalogue never serves old plans, even after a restart. Entries
+# of other versions are left to LRU/TTL eviction, since other workers may
+# still be on them.
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 3600
+# SQLite writes between LRU trims; the table may run this far past max_entries
+TRIM_EVERY = 64
+# Quantization steps for the numeric profile fields
+WEIGHT_STEP = 0.5
+HEIGHT_STEP = 1.0
+
+
+def _quantize(value, step):
+    return round(round(value / step) * step, 3)
+
+
+def quantize_profile(age, weight, height, gender, activity, preference, goal):
+    """The profile as recommend() will see it on a cached call."""
+    return (int(age), _quantize(weight, WEIGHT_STEP), _quantize(height, HEIGHT_STEP),
+            gender, activity, preference, goal)
+
+
+def cache_key(profile, seed, engine, nutrients=None):
+    return json.dumps([list(profile), seed, engine, nutrients], sort_keys=True)
+
+
+class MemoryBackend:
+    """Per-process LRU + TTL store."""
+
+    # Microseconds per call: safe to use from the event loop
+    blocking = False
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, version, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != version:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """LRU + TTL store in a local SQLite file, shared by every worker on the host."""
+
+    # Disk I/O and lock waits (up to the 5s timeout): keep off the event loop
+    blocking = True
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            # Versions are content hashes (TEXT); "entries" replaces an older integer-versioned table
+            conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, version TEXT, expires_at REAL,
+                accessed_at REAL, value TEXT)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires_at)")
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections are not shareable
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, version):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute("SELECT version, expires_at, value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or row[0] != version:
+            # Missing, or built from another catalogue
+            return None
+        if row[1] < now:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[2])
+
+    def set(self, key, version, value):
+        conn = self._connect()
+        now = time.time()
+        # The LRU trim walks max_entries rows of the accessed_at index, so it is
+        # amortised over TRIM_EVERY writes; the expiry sweep only touches expired rows
+        self._writes += 1
+        trim = self._writes % TRIM_EVERY == 0
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                         (key, version, now + self.ttl, now, json.dumps(value)))
+            if trim:
+                conn.execute("""DELETE FROM entries WHERE key IN (
+                    SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)""", (self.max_entries,))
+
+    def clear(self):
+        self._connect().execute("DELETE FROM entries")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class PlanCache:
+    """Front of DietRecommender.recommend with hit/miss counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, key, version):
+        """Cached plan or None, counting the hit or miss."""
+        plan = self.backend.get(key, version)
+        with self._lock:
+            if plan is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return plan
+
+    def put(self, key, version, plan):
+        self.backend.set(key, version, plan)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def from_env():
+    """PlanCache configured by PLAN_CACHE=memory|sqlite (off when unset)."""
+    kind = os.environ.get("PLAN_CACHE", "").lower()
+    if kind in ("", "off", "none"):
+        return None
+    max_entries = int(os.environ.get("PLAN_CACHE_SIZE", DEFAULT_MAX_ENTRIES))
+    ttl = float(os.environ.get("PLAN_CACHE_TTL", DEFAULT_TTL_SECONDS))
+    if kind == "memory":
+        return PlanCache(MemoryBackend(max_entries, ttl))
+    if kind == "sqlite":
+        path = os.environ.get("PLAN_CACHE_PATH", "plan_cache.sqlite3")
+        return PlanCache(SQLiteBackend(path, max_entries, ttl))
+    raise ValueError(f"Unknown PLAN_CACHE backend {kind!r}; expected 'memory' or 'sqlite'")
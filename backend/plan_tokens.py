@@ -0,0 +1,45 @@
+import os
+import secrets
+
+import plan_cache
+
+# Server-side state behind the PlanToken that /recommend returns on request, so
+# /recommend/swap can work on the plan the user actually saw without the
+# client sending it back. The profile is kept as recommend() saw it (already
+# quantized when the plan cache is on). Entries live in a plan_cache backend:
+# LRU + TTL, valid only on the catalogue version they were issued on, and
+# shared by all workers on the host with PLAN_TOKENS=sqlite.
+
+DEFAULT_MAX_TOKENS = 10000
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_SQLITE_PATH = "plan_tokens.sqlite3"
+
+
+class PlanTokens:
+    """Plan state keyed by random, unguessable tokens."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def issue(self, version, profile, nutrients, plan):
+        """Store one plan's state and return its token."""
+        token = secrets.token_urlsafe(16)
+        self.backend.set(token, version, {"profile": list(profile), "nutrients": nutrients, "plan": plan})
+        return token
+
+    def get(self, token, version):
+        """The stored {"profile", "nutrients", "plan"}, or None if unknown, expired or from an older catalogue."""
+        return self.backend.get(token, version)
+
+
+def from_env():
+    """PlanTokens configured by PLAN_TOKENS=memory|sqlite (memory by default)."""
+    kind = os.environ.get("PLAN_TOKENS", "memory").lower()
+    max_entries = int(os.environ.get("PLAN_TOKENS_SIZE", DEFAULT_MAX_TOKENS))
+    ttl = float(os.environ.get("PLAN_TOKENS_TTL", DEFAULT_TTL_SECONDS))
+    if kind == "memory":
+        return PlanTokens(plan_cache.MemoryBackend(max_entries, ttl))
+    if kind == "sqlite":
+        path = os.environ.get("PLAN_TOKENS_PATH", DEFAULT_SQLITE_PATH)
+        return PlanTokens(plan_cache.SQLiteBackend(path, max_entries, ttl))
+    raise ValueError(f"Unknown PLAN_TOKENS backend {kind!r}; expected 'memory' or 'sqlite'")
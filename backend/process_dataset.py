@@ -1,150 +1,397 @@
+import argparse
+import glob
+import hashlib
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 
-def preprocess_new_dataset(input_path, output_path):
-    print(f"Reading from {input_path}...")
-    df = pd.read_csv(input_path)
-    
-    # 1. Rename Columns
-    rename_map = {
-        "Dish Name": "Name",
-        "Calories (kcal)": "Calories",
-        "Protein (g)": "Proteins",
-        "Fats (g)": "Fats",
-        "Carbohydrates (g)": "Carbs"
-    }
-    df = df.rename(columns=rename_map)
-    
-    # 2. Infer Type (Veg/Non-Veg)
-    non_veg_keywords = ["Chicken", "Mutton", "Fish", "Egg", "Prawn", "Keema", "Omelette", "Beef", "Pork", "Bacon", "Ham", "Salami", "Sausage", "Meat", "Lamb", "Crab", "Shrimp"]
-    def get_type(name):
-        for kw in non_veg_keywords:
-            if kw.lower() in str(name).lower():
-                return "Non-Veg"
-        return "Veg"
-    
-    df['Type'] = df['Name'].apply(get_type)
-    
-    # 3. Infer Category & Meal Type
-    def get_category_meal(name):
-        name = str(name).lower()
-        
-        # --- 1. STRICT EXCLUSIONS (Ingredients / Not a Meal) ---
-        # These should be removed from the dataset entirely by the caller loop, 
-        # but if they slip through, mark them as Snack/Side to be safe.
-        ingredient_keywords = [
-            "icing", "frosting", "filling", "spread", "sauce", "dip", "jam", "jelly", 
-            "syrup", "concentrate", "crush", "squash", "puree", "paste", "powder", 
-            "flour", "oil", "seeds", "raw", "dough", "batter", "extract", "essence",
-            "stock", "vinegar", "dressing", "mayonnaise", "butter", "ghee", "cream",
-            "sugar", "salt", "spice", "condiment", "masala"
-        ]
-        # Exceptions: "Butter Chicken", "Ice Cream", "Fruit Salad with Cream", "Paneer Butter Masala"
-        if any(x in name for x in ingredient_keywords):
-             if "butter" in name and any(x in name for x in ["chicken", "paneer", "masala", "milk", "nan", "roti"]):
-                 pass # Allow Butter Chicken, Paneer Butter Masala
-             elif "cream" in name and any(x in name for x in ["soup", "salad", "chicken", "veg", "fruit", "ice"]):
-                 pass # Allow Cream soups, Ice cream
-             elif "sauce" in name and any(x in name for x in ["pasta", "spaghetti", "fish", "chicken", "veg"]):
-                 pass # Allow dishes in sauce
-             elif "masala" in name:
-                 # Only allow Masala if it specifies a main ingredient
-                 if any(x in name for x in ["paneer", "chicken", "chana", "rajma", "gobi", "bhindi", "aloo", "mushroom", "egg", "fish", "mutton", "veg", "kofta", "dosa", "vada", "prawn", "shrimp", "crab", "lobia", "soya", "chaat"]):
-                     pass
-                 else:
-                     return "Exclude", "Exclude"
-             else:
-                 return "Exclude", "Exclude"
-
-        # --- 2. SNACKS (Deep Fried / Junk / Light) ---
-        # These should NEVER be Lunch/Dinner main courses
-        snack_keywords = [
-            "murukku", "chakli", "sev", "mixture", "bhujia", "chips", "puff", 
-            "vada", "samosa", "pakora", "pakoda", "cutlet", "roll", "bonda", "bajji", 
-            "mathri", "khakhra", "chivda", "dhokla", "khandvi", "patra", "muthiya",
-            "manchurian", "65", "lollipop", "fingers", "nuggets", "pizza", "burger", 
-            "fries", "frankie", "tacos", "nachos", "popcorn", "sandwich", "toast",
-            "biscuit", "cookie", "cake", "pastry", "tart", "pie", "doughnut", 
-            "chocolate", "candy", "sweet", "dessert", "ice cream", "halwa", "kheer", 
-            "laddu", "barfi", "burfi", "pedha", "gulab jamun", "rasgulla", "jalebi", "mysore pak",
-            "sonpapdi", "rasmalai", "petha", "gazak", "chikki", "kalakand", "pinni", "modak"
-        ]
-        
-        if any(x in name for x in snack_keywords):
-            # Exceptions for Breakfast
-            if "sandwich" in name or "toast" in name or "cutlet" in name or "dhokla" in name:
-                 # Some can be breakfast, but let's keep them out of Lunch/Dinner
-                 return "Snack", "Snack" 
-            return "Snack", "Snack"
-
-        # --- 3. BEVERAGES ---
-        if any(x in name for x in ["tea", "coffee", "juice", "shake", "lassi", "buttermilk", "milk", "drink", "sherbet", "thandai", "kanji", "smoothie", "soda", "water", "soup", "shorba", "cooler", "squash"]):
-            return "Beverage", "Side"
-
-        # --- 4. SIDES ---
-        if any(x in name for x in ["raita", "salad", "papad", "chutney", "pickle", "yogurt", "curd", "achar"]):
-            return "Side", "Side"
-
-        # --- 5. BREAKFAST ---
-        breakfast_keywords = ["paratha", "dosa", "idli", "poha", "upma", "omelette", "bhurji", "cheela", "pancake", "waffle", "cereal", "oats", "cornflakes", "muesli", "appam", "uthappam", "puri", "poori", "bhatura", "thepla", "thalipeeth", "roti", "chapati", "naan", "kulcha"]
-        
-        if any(x in name for x in breakfast_keywords):
-            return "Breakfast", "Breakfast"
-
-        # --- 6. MAIN COURSE (LUNCH/DINNER) ---
-        
-        # Rice / Complete Meals
-        if any(x in name for x in ["biryani", "pulao", "khichdi", "fried rice", "rice", "tahri", "bisibelebath", "lemon rice", "tamarind rice", "jeera rice", "curd rice", "daliya", "pasta", "noodle", "macaroni", "spaghetti", "lasagne", "chowmein"]):
-            if any(x in name for x in ["biryani", "khichdi", "bisibelebath", "curd rice", "fried rice", "daliya", "pasta", "noodle", "macaroni", "spaghetti", "lasagne", "chowmein"]):
-                return "Complete", "Lunch/Dinner"
-            return "RiceSide", "Lunch/Dinner"
-
-        # Gravies (Curries)
-        if any(x in name for x in ["curry", "masala", "dal", "korma", "makhani", "vindaloo", "saag", "gravy", "paneer", "chicken", "mutton", "fish", "kofta", "kadhi", "sambhar", "rajma", "chole", "lobia", "kootu", "stew", "handi", "lababdar", "do pyaza", "butter", "pasanda", "rezala", "rogan josh", "moilee", "xacuti"]):
-            return "Gravy", "Lunch/Dinner"
-
-        # Dry Sabzis
-        if any(x in name for x in ["fry", "bharta", "jeera aloo", "gobi", "bhindi", "mix veg", "poriyal", "thoran", "sabzi", "saute", "methi", "palak", "bhurji", "chana", "baingan", "capsicum", "cabbage", "beans", "aloo", "gajar", "mutter", "sarson", "dry"]):
-            return "Dry", "Lunch/Dinner"
-        
-        # Default fallback - If we don't know what it is, it's safer to call it a Snack than a main meal
-        return "Snack", "Snack"
-
-    # Rebuild dataframe with exploded rows for Lunch/Dinner
-    new_rows = []
-    
-    for _, row in df.iterrows():
-        cat, meal_type = get_category_meal(row['Name'])
-        
-        if cat == "Exclude":
-            continue
-            
-        meals = []
-        if meal_type == "Lunch/Dinner":
-            meals = ["Lunch", "Dinner"]
+import catalogue
+
+RENAME_MAP = {
+    "Dish Name": "Name",
+    "Calories (kcal)": "Calories",
+    "Protein (g)": "Proteins",
+    "Fats (g)": "Fats",
+    "Carbohydrates (g)": "Carbs",
+    "Free Sugar (g)": "Sugar",
+    "Fibre (g)": "Fibre",
+    "Sodium (mg)": "Sodium",
+    "Calcium (mg)": "Calcium",
+    "Iron (mg)": "Iron",
+    "Vitamin C (mg)": "VitaminC",
+    "Folate (µg)": "Folate"
+}
+
+NON_VEG_KEYWORDS = ["Chicken", "Mutton", "Fish", "Egg", "Prawn", "Keema", "Omelette", "Beef", "Pork", "Bacon", "Ham", "Salami", "Sausage", "Meat", "Lamb", "Crab", "Shrimp"]
+
+# --- 1. STRICT EXCLUSIONS (Ingredients / Not a Meal) ---
+INGREDIENT_KEYWORDS = [
+    "icing", "frosting", "filling", "spread", "sauce", "dip", "jam", "jelly",
+    "syrup", "concentrate", "crush", "squash", "puree", "paste", "powder",
+    "flour", "oil", "seeds", "raw", "dough", "batter", "extract", "essence",
+    "stock", "vinegar", "dressing", "mayonnaise", "butter", "ghee", "cream",
+    "sugar", "salt", "spice", "condiment", "masala"
+]
+# Exceptions: "Butter Chicken", "Ice Cream", "Fruit Salad with Cream", "Paneer Butter Masala"
+INGREDIENT_EXCEPTIONS = {
+    "butter": ["chicken", "paneer", "masala", "milk", "nan", "roti"],
+    "cream": ["soup", "salad", "chicken", "veg", "fruit", "ice"],
+    "sauce": ["pasta", "spaghetti", "fish", "chicken", "veg"],
+    # Only allow Masala if it specifies a main ingredient
+    "masala": ["paneer", "chicken", "chana", "rajma", "gobi", "bhindi", "aloo", "mushroom", "egg", "fish", "mutton", "veg", "kofta", "dosa", "vada", "prawn", "shrimp", "crab", "lobia", "soya", "chaat"],
+}
+
+# --- 2. SNACKS (Deep Fried / Junk / Light) ---
+# These should NEVER be Lunch/Dinner main courses
+SNACK_KEYWORDS = [
+    "murukku", "chakli", "sev", "mixture", "bhujia", "chips", "puff",
+    "vada", "samosa", "pakora", "pakoda", "cutlet", "roll", "bonda", "bajji",
+    "mathri", "khakhra", "chivda", "dhokla", "khandvi", "patra", "muthiya",
+    "manchurian", "65", "lollipop", "fingers", "nuggets", "pizza", "burger",
+    "fries", "frankie", "tacos", "nachos", "popcorn", "sandwich", "toast",
+    "biscuit", "cookie", "cake", "pastry", "tart", "pie", "doughnut",
+    "chocolate", "candy", "sweet", "dessert", "ice cream", "halwa", "kheer",
+    "laddu", "barfi", "burfi", "pedha", "gulab jamun", "rasgulla", "jalebi", "mysore pak",
+    "sonpapdi", "rasmalai", "petha", "gazak", "chikki", "kalakand", "pinni", "modak"
+]
+
+# --- 3. BEVERAGES ---
+BEVERAGE_KEYWORDS = ["tea", "coffee", "juice", "shake", "lassi", "buttermilk", "milk", "drink", "sherbet", "thandai", "kanji", "smoothie", "soda", "water", "soup", "shorba", "cooler", "squash"]
+
+# --- 4. SIDES ---
+SIDE_KEYWORDS = ["raita", "salad", "papad", "chutney", "pickle", "yogurt", "curd", "achar"]
+
+# --- 5. BREAKFAST ---
+BREAKFAST_KEYWORDS = ["paratha", "dosa", "idli", "poha", "upma", "omelette", "bhurji", "cheela", "pancake", "waffle", "cereal", "oats", "cornflakes", "muesli", "appam", "uthappam", "puri", "poori", "bhatura", "thepla", "thalipeeth", "roti", "chapati", "naan", "kulcha"]
+
+# --- 6. MAIN COURSE (LUNCH/DINNER) ---
+# Rice / Complete Meals
+RICE_KEYWORDS = ["biryani", "pulao", "khichdi", "fried rice", "rice", "tahri", "bisibelebath", "lemon rice", "tamarind rice", "jeera rice", "curd rice", "daliya", "pasta", "noodle", "macaroni", "spaghetti", "lasagne", "chowmein"]
+COMPLETE_KEYWORDS = ["biryani", "khichdi", "bisibelebath", "curd rice", "fried rice", "daliya", "pasta", "noodle", "macaroni", "spaghetti", "lasagne", "chowmein"]
+
+# Gravies (Curries)
+GRAVY_KEYWORDS = ["curry", "masala", "dal", "korma", "makhani", "vindaloo", "saag", "gravy", "paneer", "chicken", "mutton", "fish", "kofta", "kadhi", "sambhar", "rajma", "chole", "lobia", "kootu", "stew", "handi", "lababdar", "do pyaza", "butter", "pasanda", "rezala", "rogan josh", "moilee", "xacuti"]
+
+# Dry Sabzis
+DRY_KEYWORDS = ["fry", "bharta", "jeera aloo", "gobi", "bhindi", "mix veg", "poriyal", "thoran", "sabzi", "saute", "methi", "palak", "bhurji", "chana", "baingan", "capsicum", "cabbage", "beans", "aloo", "gajar", "mutter", "sarson", "dry"]
+
+
+def _trie_regex(keywords):
+    # Factor common prefixes so the regex walks a trie instead of trying
+    # every keyword at every position; greedy optionals prefer the longest
+    trie = {}
+    for kw in keywords:
+        node = trie
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ''
+        body = alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Single-pass substring matcher over several keyword lists at once.
+
+    All keywords are compiled into one trie-shaped regex and run as a
+    zero-width lookahead over the joined names, which reports the longest
+    keyword starting at every position. Any keyword that is a prefix of it
+    starts there too, so one scan yields every (list, name) hit.
+    """
+
+    def __init__(self, lists):
+        self.lists = list(lists)
+        lowered = [{kw.lower() for kw in kws} for kws in lists.values()]
+        keywords = sorted(set().union(*lowered))
+        self.ids = {kw: i for i, kw in enumerate(keywords)}
+        # membership[k, l]: keyword k (or a prefix of it) belongs to list l
+        self.membership = np.array(
+            [[any(kw.startswith(k) for k in kws) for kws in lowered] for kw in keywords],
+            dtype=bool
+        )
+        self.pattern = re.compile('(?=(' + _trie_regex(keywords) + '))')
+
+    def scan(self, names):
+        """Map each list name to a boolean array: does names[i] contain any of its keywords."""
+        lengths = np.fromiter((len(n) + 1 for n in names), dtype=np.int64, count=len(names))
+        offsets = np.cumsum(lengths) - lengths
+        text = "\n".join(names)
+
+        ids = self.ids
+        found = [(m.start(), ids[m.group(1)]) for m in self.pattern.finditer(text)]
+        hits = np.zeros((len(names), len(self.lists)), dtype=bool)
+        if found:
+            starts, kw_ids = np.array(found, dtype=np.int64).T
+            rows = np.searchsorted(offsets, starts, side='right') - 1
+            np.logical_or.at(hits, rows, self.membership[kw_ids])
+        return dict(zip(self.lists, hits.T))
+
+
+_MATCHER = KeywordMatcher({
+    "non_veg": NON_VEG_KEYWORDS,
+    "ingredient": INGREDIENT_KEYWORDS,
+    **{kw: [kw] for kw in INGREDIENT_EXCEPTIONS},
+    **{f"{kw}_ok": allowed for kw, allowed in INGREDIENT_EXCEPTIONS.items()},
+    "snack": SNACK_KEYWORDS,
+    "beverage": BEVERAGE_KEYWORDS,
+    "side": SIDE_KEYWORDS,
+    "breakfast": BREAKFAST_KEYWORDS,
+    "rice": RICE_KEYWORDS,
+    "complete": COMPLETE_KEYWORDS,
+    "gravy": GRAVY_KEYWORDS,
+    "dry": DRY_KEYWORDS,
+})
+
+
+def classify_dishes(names):
+    """Vectorized Type / Category / Meal_Type inference for a Series of dish names.
+
+    Rules are applied as boolean masks in priority order; the first matching
+    rule wins. Ingredients get Category "Exclude" and should be dropped by
+    the caller.
+    """
+    # Classify each distinct name once; missing names read as str() of them ("nan"), like any other
+    codes, uniques = pd.factorize(names, use_na_sentinel=False)
+    uniques = [str(name).lower() for name in uniques]
+    hits = _MATCHER.scan(uniques)
+
+    dish_type = np.where(hits["non_veg"], "Non-Veg", "Veg")
+
+    # Ingredient keywords exclude the row unless a dish-specific exception applies
+    allowed = np.zeros(len(uniques), dtype=bool)
+    for kw in INGREDIENT_EXCEPTIONS:
+        allowed |= hits[kw] & hits[f"{kw}_ok"]
+    exclude = hits["ingredient"] & ~allowed
+
+    rules = [
+        (exclude, "Exclude", "Exclude"),
+        (hits["snack"], "Snack", "Snack"),
+        (hits["beverage"], "Beverage", "Side"),
+        (hits["side"], "Side", "Side"),
+        (hits["breakfast"], "Breakfast", "Breakfast"),
+        (hits["rice"] & hits["complete"], "Complete", "Lunch/Dinner"),
+        (hits["rice"], "RiceSide", "Lunch/Dinner"),
+        (hits["gravy"], "Gravy", "Lunch/Dinner"),
+        (hits["dry"], "Dry", "Lunch/Dinner"),
+    ]
+    conditions = [cond for cond, _, _ in rules]
+    # Default fallback - If we don't know what it is, it's safer to call it a Snack than a main meal
+    category = np.select(conditions, [cat for _, cat, _ in rules], default="Snack")
+    meal_type = np.select(conditions, [meal for _, _, meal in rules], default="Snack")
+
+    return dish_type[codes], category[codes], meal_type[codes]
+
+
+def explode_meals(df):
+    """Drop excluded rows and duplicate Lunch/Dinner dishes into one row per meal."""
+    df = df[df['Category'].to_numpy() != "Exclude"]
+    both = (df['Meal_Type'] == "Lunch/Dinner").to_numpy()
+    positions = np.repeat(np.arange(len(df)), np.where(both, 2, 1))
+    out = df.iloc[positions].reset_index(drop=True)
+
+    # Each Lunch/Dinner pair becomes a Lunch row followed by a Dinner row
+    meal_type = out['Meal_Type'].to_numpy(dtype=object).copy()
+    pair = meal_type == "Lunch/Dinner"
+    first = pair & np.r_[True, positions[1:] != positions[:-1]]
+    meal_type[first] = "Lunch"
+    meal_type[pair & ~first] = "Dinner"
+    out['Meal_Type'] = meal_type
+    return out
+
+
+LABEL_COLS = ["Type", "Category", "Meal_Type"]
+FINAL_COLS = ["Name", "Type", *catalogue.NUTRIENT_COLUMNS, "Meal_Type", "Category"]
+
+
+def load_raw(input_path):
+    """Read the raw nutrition CSV with columns renamed to the catalogue schema."""
+    return pd.read_csv(input_path).rename(columns=RENAME_MAP)
+
+
+def row_hashes(df):
+    """Content hash per raw row; unchanged rows keep their hash across file edits."""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def classify_frame(df):
+    """Add Type, Category and Meal_Type columns to a renamed raw frame."""
+    df = df.copy()
+    df['Type'], df['Category'], df['Meal_Type'] = classify_dishes(df['Name'])
+    return df
+
+
+# Changes to any keyword list invalidate cached classifications
+_RULES_DIGEST = hashlib.sha256(repr([
+    NON_VEG_KEYWORDS, INGREDIENT_KEYWORDS, INGREDIENT_EXCEPTIONS, SNACK_KEYWORDS,
+    BEVERAGE_KEYWORDS, SIDE_KEYWORDS, BREAKFAST_KEYWORDS, RICE_KEYWORDS,
+    COMPLETE_KEYWORDS, GRAVY_KEYWORDS, DRY_KEYWORDS,
+]).encode("utf-8")).digest()
+
+
+def content_hash(input_path):
+    """Hash of the input bytes and the classification rules."""
+    digest = hashlib.sha256(_RULES_DIGEST)
+    with open(input_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _artifact_path(input_path, digest):
+    stem, _ = os.path.splitext(input_path)
+    return f"{stem}.{digest}.classified.csv"
+
+
+def write_classified_artifact(input_path, labels, digest=None):
+    """Store per-row Type/Category/Meal_Type next to `input_path`, replacing older artifacts."""
+    digest = digest or content_hash(input_path)
+    path = _artifact_path(input_path, digest)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    labels[LABEL_COLS].to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    # Only <stem>.<16 hex digits>.classified.csv: "foo.bar.<hash>..." belongs to foo.bar.csv
+    for stale in glob.glob(_artifact_path(glob.escape(input_path), "[0-9a-f]" * 16)):
+        if stale != path:
+            os.remove(stale)
+
+
+def classify_cached(input_path):
+    """Renamed raw frame with Type/Category/Meal_Type, reusing a content-hashed artifact.
+
+    The artifact sits next to the source CSV and is only rebuilt when the
+    input bytes (or the keyword rules) change, so callers never reclassify
+    an unchanged dataset.
+    """
+    digest = content_hash(input_path)
+    df = load_raw(input_path)
+    path = _artifact_path(input_path, digest)
+    if os.path.exists(path):
+        labels = pd.read_csv(path, dtype=str, keep_default_na=False)
+        if len(labels) == len(df) and list(labels.columns) == LABEL_COLS:
+            return df.assign(**{col: labels[col].to_numpy(dtype=object) for col in LABEL_COLS})
+
+    df = classify_frame(df)
+    write_classified_artifact(input_path, df[LABEL_COLS], digest)
+    return df
+
+
+def finalize(classified_df):
+    """Explode classified dish rows into the processed catalogue schema."""
+    processed_df = explode_meals(classified_df)
+
+    # Ensure numeric columns (always float, so every chunk of a streamed ingest agrees);
+    # datasets without the micronutrient columns get zeros
+    for col in catalogue.NUTRIENT_COLUMNS:
+        if col in processed_df:
+            processed_df[col] = pd.to_numeric(processed_df[col], errors='coerce').fillna(0).astype(float)
         else:
-            meals = [meal_type]
-    
-        for m in meals:
-            new_row = row.copy()
-            new_row['Category'] = cat
-            new_row['Meal_Type'] = m
-            new_rows.append(new_row)
-    
-    processed_df = pd.DataFrame(new_rows)
-    
-    # Ensure numeric columns
-    for col in ['Calories', 'Proteins', 'Fats', 'Carbs']:
-        processed_df[col] = pd.to_numeric(processed_df[col], errors='coerce').fillna(0)
-    
+            processed_df[col] = 0.0
+
     # Select final columns
-    final_cols = ["Name", "Type", "Calories", "Proteins", "Fats", "Carbs", "Meal_Type", "Category"]
-    processed_df = processed_df[final_cols]
-    
+    return processed_df[FINAL_COLS]
+
+
+DEFAULT_CHUNK_ROWS = 100_000
+
+
+def _process_chunk(chunk):
+    return finalize(classify_frame(chunk))
+
+
+def iter_processed_chunks(input_path, chunk_rows=DEFAULT_CHUNK_ROWS, workers=1):
+    """Yield processed frames for consecutive raw chunks of `input_path`, in file order.
+
+    With workers > 1 chunks are classified in a process pool; at most two
+    chunks per worker are read ahead, so memory stays bounded.
+    """
+    chunks = (chunk.rename(columns=RENAME_MAP) for chunk in pd.read_csv(input_path, chunksize=chunk_rows))
+    if workers <= 1:
+        for chunk in chunks:
+            yield _process_chunk(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_process_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def stream_preprocess(input_path, output_path=None, catalogue_path=None, chunk_rows=DEFAULT_CHUNK_ROWS, workers=1):
+    """Chunked preprocess_new_dataset: bounded memory, CSV and/or catalogue output.
+
+    Outputs are built under temporary names and renamed into place once the
+    whole input has been processed. Returns the number of processed rows.
+    """
+    csv_tmp = f"{output_path}.{os.getpid()}.tmp" if output_path else None
+    writer = catalogue.CatalogueWriter(catalogue_path, content_hash(input_path)) if catalogue_path else None
+    rows = 0
+    try:
+        for chunk in iter_processed_chunks(input_path, chunk_rows, workers):
+            if csv_tmp:
+                chunk.to_csv(csv_tmp, mode="a" if rows else "w", header=not rows, index=False)
+            if writer:
+                writer.append(chunk)
+            rows += len(chunk)
+        if csv_tmp and not rows:
+            pd.DataFrame(columns=FINAL_COLS).to_csv(csv_tmp, index=False)
+    except BaseException:
+        if writer:
+            writer.abort()
+        if csv_tmp and os.path.exists(csv_tmp):
+            os.remove(csv_tmp)
+        raise
+    if csv_tmp:
+        os.replace(csv_tmp, output_path)
+    if writer:
+        writer.close()
+    return rows
+
+
+def preprocess_new_dataset(input_path, output_path, catalogue_path=None, chunk_rows=None, workers=1):
+    if chunk_rows:
+        print(f"Streaming {input_path} in chunks of {chunk_rows} rows...")
+        rows = stream_preprocess(input_path, output_path, catalogue_path, chunk_rows, workers)
+        print(f"Wrote {rows} rows. Done!")
+        return
+
+    print(f"Reading from {input_path}...")
+    # 1. Rename Columns
+    df = load_raw(input_path)
+
+    # 2. Infer Type (Veg/Non-Veg), Category & Meal Type
+    df = classify_frame(df)
+
+    # 3. Explode rows for Lunch/Dinner
+    processed_df = finalize(df)
+
     print(f"Writing to {output_path}...")
     processed_df.to_csv(output_path, index=False)
+    if catalogue_path:
+        print(f"Writing binary catalogue to {catalogue_path}...")
+        catalogue.write_catalogue(processed_df, catalogue_path, content_hash(input_path))
     print("Done!")
 
 if __name__ == "__main__":
-    preprocess_new_dataset("Indian_Food_Nutrition_Processed.csv", "food_data_processed.csv")
-
+    parser = argparse.ArgumentParser(description="Classify a raw nutrition CSV into the processed food catalogue.")
+    parser.add_argument("input", nargs="?", default="Indian_Food_Nutrition_Processed.csv")
+    parser.add_argument("output", nargs="?", default="food_data_processed.csv")
+    parser.add_argument("--catalogue", default="food_data_processed.catalog",
+                        help="binary catalogue directory to write as well ('' to skip)")
+    parser.add_argument("--chunk-rows", type=int, default=None,
+                        help="stream the input in chunks of this many rows (bounded memory)")
+    parser.add_argument("--workers", type=int, default=1, help="processes classifying chunks in parallel")
+    args = parser.parse_args()
+    preprocess_new_dataset(args.input, args.output, args.catalogue or None, args.chunk_rows, args.workers)
@@ -1,189 +1,268 @@
+import json
+import os
+
 import pandas as pd
-from sklearn.neighbors import NearestNeighbors
 import numpy as np
-import random
+import metrics
+from calorie_index import CalorieIndex, MealPool
+from dish_search import DishSearchIndex
+import catalogue
+import energy
+import nutrition
+import process_dataset
+import optimizer
+
+ENGINES = ("greedy", "optimal")
+# Days before a dish may be served again in multi-day plans
+DEFAULT_REPEAT_WINDOW = 3
+# Main dish keyword -> side keywords to pair it with, in order of preference
+DEFAULT_PAIRINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pairings.json")
+# Calorie-nearest dishes rescored by nutrient cost when constraints are given
+NUTRIENT_CANDIDATES = 12
+# Alternatives offered per swap, and the least a swap aims for (as a share of
+# the meal's usual targets) when the rest of the plan already uses up the day
+DEFAULT_SWAP_OPTIONS = 3
+MIN_SWAP_SHARE = 0.5
+# Non-nutrient fields of the dish dicts _row() builds
+ROW_LABELS = ['Name', 'Type', 'Category']
+ROW_KEYS = ROW_LABELS + catalogue.NUTRIENT_COLUMNS
+# Calories, Proteins, Fats, Carbs: the micronutrients follow them in NUTRIENT_COLUMNS
+MACRO_COUNT = len(catalogue.NUTRIENT_COLUMNS) - len(catalogue.MICRONUTRIENT_COLUMNS)
+
+
+def resolve_seed(seed):
+    """`seed`, or a fresh random one when None, so every plan can be replayed."""
+    if seed is None:
+        return int(np.random.SeedSequence().generate_state(1)[0])
+    return int(seed)
 
 class DietRecommender:
-    def __init__(self, data_path="food_data.csv"):
-        self.df = pd.read_csv(data_path)
-        # Check if it's the new dataset by checking columns
-        if "Dish Name" in self.df.columns:
-            self.df = self._preprocess_new_dataset(self.df)
+    def __init__(self, data_path="food_data.csv", df=None, pairings_path=DEFAULT_PAIRINGS_PATH):
+        if df is not None:
+            # Already-processed frame, e.g. from an incremental catalogue reload
+            self.dishes = catalogue.dishes_from_frame(df)
+        elif catalogue.is_catalogue(data_path):
+            # Compact binary catalogue written by process_dataset, memory-mapped
+            self.dishes = catalogue.load_dishes(data_path)
+        elif "Dish Name" in pd.read_csv(data_path, nrows=0).columns:
+            # Raw dataset: shared pipeline, reusing the cached classification when unchanged
+            self.dishes = catalogue.dishes_from_frame(process_dataset.finalize(process_dataset.classify_cached(data_path)))
+        else:
+            self.dishes = catalogue.dishes_from_frame(pd.read_csv(data_path))
             
         self.staples = {
             "Chapati": {"Calories": 100, "Proteins": 3, "Fats": 1, "Carbs": 20},
             "Steamed Rice (1 cup)": {"Calories": 150, "Proteins": 3, "Fats": 0.5, "Carbs": 35}
         }
-        # Pre-filter sides and beverages
-        self.sides_df = self.df[self.df['Category'].isin(['Side', 'Beverage'])].drop_duplicates(subset=['Name'])
-
-    def _preprocess_new_dataset(self, df):
-        # 1. Rename Columns
-        df = df.rename(columns={
-            "Dish Name": "Name",
-            "Calories (kcal)": "Calories",
-            "Protein (g)": "Proteins",
-            "Fats (g)": "Fats",
-            "Carbohydrates (g)": "Carbs"
-        })
-        
-        # 2. Infer Type (Veg/Non-Veg)
-        non_veg_keywords = ["Chicken", "Mutton", "Fish", "Egg", "Prawn", "Keema", "Omelette", "Beef", "Pork"]
-        def get_type(name):
-            for kw in non_veg_keywords:
-                if kw.lower() in str(name).lower():
-                    return "Non-Veg"
-            return "Veg"
+        # Positions below are dish positions (one record per dish, whatever its
+        # meals). The nutrient matrix is used in place, memory-mapped when
+        # loaded from a catalogue; _nutrients_at() gathers float64 rows from it
+        self.nutrients = self.dishes.nutrients
+        self.calories = self.nutrients[:, 0]
+        # Labels per dish; _row() pairs them with the nutrient matrix, so picking a
+        # dish never builds a pandas object
+        self.names = self.dishes.names
+        types = np.array(self.dishes.types + [None], dtype=object)[self.dishes.type_codes]
+        categories = np.array(self.dishes.categories + [None], dtype=object)[self.dishes.category_codes]
+        self.labels = np.column_stack([self.names, types, categories])
+        # Savory side pools (no sweet drinks) per dietary preference: dish positions,
+        # calories and micronutrients
+        is_side = np.isin(categories, ['Side', 'Beverage'])
+        side_rows = np.flatnonzero(is_side)
+        side_rows = side_rows[~pd.Series(self.names[side_rows]).duplicated().to_numpy()]
+        side_names = pd.Series(self.names[side_rows], dtype=object).astype(str).str.lower()
+        savory = ~side_names.str.contains('shake|juice|coffee|tea', regex=True).to_numpy()
+        veg = types[side_rows] == 'Veg'
+        self.side_pools = {}
+        for preference, keep in [("Veg", savory & veg), ("Any", savory)]:
+            rows = side_rows[keep]
+            stats = self._nutrients_at(rows)
+            self.side_pools[preference] = (rows, stats[:, 0], stats[:, MACRO_COUNT:])
+        # Sorted calorie index for closest-dish lookups
+        self.index = CalorieIndex(self.dishes)
+        # Fuzzy name search over the same unique names
+        self.search_index = DishSearchIndex(self.dishes, self.index.name_codes, self.index.names)
+        # Main dish name -> position of its lowest-calorie pairing side
+        with open(pairings_path) as f:
+            self.pairings = json.load(f)
+        names = pd.Series(self.index.names, dtype=object)
+        rows = self._pairing_rows(names)
+        self.pairing_map = {name: int(row) for name, row in zip(names, rows) if row >= 0}
+
+    def _nutrients_at(self, positions):
+        """float64 (len(positions) x NUTRIENT_COLUMNS) copy of some dishes' nutrients."""
+        return np.asarray(self.nutrients[positions], dtype=float).reshape(len(positions), -1)
+
+    def calculate_bmr(self, weight, height, age, gender):
+        # Same formulas as energy.profile_energy uses for whole batches
+        return energy.bmr(weight, height, age, gender)
+
+    def calculate_tdee(self, bmr, activity_level, goal):
+        return energy.tdee(bmr, activity_level, goal)
+
+    @metrics.timed("recommend")
+    def recommend(self, age, weight, height, gender, activity_level, veg_preference, goal, seed=None, engine="greedy",
+                  nutrients=None, energy_needs=None):
+        """One day's plan. `nutrients` (a dict of nutrition.GOALS/CAPS limits, {} for
+        the defaults) switches dish choice to micronutrient-aware scoring.
+        `energy_needs` is this profile's (BMR, TDEE) when a batch already
+        computed them with energy.profile_energy."""
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+        bmr, tdee, targets = self._energy_targets(age, weight, height, gender, activity_level, goal, energy_needs)
+        limits = None if nutrients is None else nutrition.daily_limits(nutrients, tdee, gender)
+        seed = resolve_seed(seed)
         
-        df['Type'] = df['Name'].apply(get_type)
+        # Base filter for Veg/Non-Veg
+        types = ('Veg',) if veg_preference == "Veg" else ('Veg', 'Non-Veg')
         
-        # 3. Infer Category & Meal Type
-        def get_category_meal(name):
-            name = str(name).lower()
-            
-            # 1. Desserts (Strictly exclude from main meals)
-            if any(x in name for x in ["burfi", "barfi", "laddu", "ladoo", "halwa", "kheer", "payasam", "jamun", "jalebi", "cake", "cookie", "chocolate", "sweet", "mysore pak", "peda", "rasgulla", "rasmalai", "gajak", "kalakand", "petha", "sandesh", "shrikhand", "pinni", "modak"]):
-                return "Snack", "Snack"
+        recommendations = None
+        if engine == "optimal":
+            # Solve the whole day at once; None means no solution within budget
+            with metrics.stage("optimal"):
+                recommendations = optimizer.plan_day(self, targets, tdee, types, veg_preference, limits=limits)
+            if recommendations is None:
+                engine = "greedy"
+        if recommendations is None:
+            # Private generator so a seeded call is reproducible and thread-safe
+            rng = np.random.default_rng(seed)
+            recommendations = self._plan_greedy(targets, types, veg_preference, rng, limits=limits)
 
-            # 2. Beverages
-            if any(x in name for x in ["tea", "coffee", "juice", "shake", "lassi", "buttermilk", "milk", "drink", "sherbet", "thandai", "kanji"]):
-                return "Beverage", "Side"
+        result = {
+            "BMR": round(bmr, 2),
+            "TDEE": round(tdee, 2),
+            **self._score_plan(recommendations, tdee, targets),
+            "Nutrients": nutrition.plan_totals(recommendations),
+            "Engine": engine,
+            "Seed": seed,
+            "Plan": recommendations
+        }
+        if limits is not None:
+            result["NutrientLimits"] = limits.resolved
+        return result
 
-            # 3. Sides (Accompaniments)
-            if any(x in name for x in ["raita", "salad", "papad", "chutney", "pickle", "sauce", "dip", "ketchup", "yogurt", "curd"]):
-                return "Side", "Side"
+    def recommend_range(self, age, weight, height, gender, activity_level, veg_preference, goal,
+                        days=7, seed=None, engine="greedy", repeat_window=DEFAULT_REPEAT_WINDOW, nutrients=None):
+        """Plan `days` consecutive days; no dish repeats within `repeat_window` days.
 
-            # 4. Breakfast (Specific items)
-            if any(x in name for x in ["paratha", "dosa", "idli", "poha", "upma", "sandwich", "toast", "omelette", "bhurji", "cheela", "pancake", "waffle", "cereal", "oats", "cornflakes", "muesli", "appam", "uthappam"]):
-                return "Breakfast", "Breakfast"
+        Targets, the candidate pools and (for the optimal engine) the candidate
+        meals are computed once and shared by every day.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+        if days < 1:
+            raise ValueError("days must be at least 1")
+        if repeat_window < 0:
+            raise ValueError("repeat_window must not be negative")
+        # Any window of `days` or more already rules out every repeat
+        repeat_window = min(repeat_window, days)
+        bmr, tdee, targets = self._energy_targets(age, weight, height, gender, activity_level, goal)
+        limits = None if nutrients is None else nutrition.daily_limits(nutrients, tdee, gender)
+        types = ('Veg',) if veg_preference == "Veg" else ('Veg', 'Non-Veg')
+        seed = resolve_seed(seed)
+        rng = np.random.default_rng(seed)
+        candidates = None
+        if engine == "optimal":
+            candidates = optimizer.build_candidates(self, targets, types, veg_preference,
+                                                    optimizer.CANDIDATES_PER_POOL * 2)
 
-            # 5. Snacks (Savoury/Light)
-            if any(x in name for x in ["samosa", "pakora", "burger", "pizza", "roll", "cutlet", "chaat", "bhel", "puri", "vada", "bonda", "bajji", "dhokla", "khandvi", "mathri", "khakhra", "biscuit", "puff", "fries", "chips", "namkeen", "sev", "bhujia", "tikki", "kachori", "momo", "spring roll", "wrap", "frankie"]):
-                return "Snack", "Snack"
+        # Day on which each dish was last served
+        last_used = np.full(len(self.index.names), -repeat_window - 1, dtype=np.int64)
+        plan_days = []
+        for day in range(days):
+            recent = last_used >= day - repeat_window
+            recommendations, day_engine = None, engine
+            if engine == "optimal":
+                recommendations = optimizer.plan_day(self, targets, tdee, types, veg_preference,
+                                                     candidates=candidates, blocked=recent, limits=limits)
+                if recommendations is None:
+                    day_engine = "greedy"
+            if recommendations is None:
+                recommendations = self._plan_greedy(targets, types, veg_preference, rng, used=recent,
+                                                    limits=limits)
 
-            # 6. Main Course - Rice/Complete
-            if any(x in name for x in ["biryani", "pulao", "khichdi", "fried rice", "rice", "tahri", "bisibelebath", "lemon rice", "tamarind rice"]):
-                return "Complete", "Lunch/Dinner"
+            today = self.index.new_used_mask()
+            self._mark_plan(today, recommendations)
+            last_used[today] = day
+            plan_days.append({
+                "Day": day + 1,
+                **self._score_plan(recommendations, tdee, targets),
+                "Nutrients": nutrition.plan_totals(recommendations),
+                "Engine": day_engine,
+                "Plan": recommendations
+            })
 
-            # 7. Main Course - Gravies (Curries)
-            if any(x in name for x in ["curry", "masala", "dal", "korma", "makhani", "vindaloo", "saag", "gravy", "paneer", "chicken", "mutton", "fish", "kofta", "kadhi", "sambhar", "rajma", "chole", "lobia", "kootu", "stew"]):
-                return "Gravy", "Lunch/Dinner"
+        result = {
+            "BMR": round(bmr, 2),
+            "TDEE": round(tdee, 2),
+            "Seed": seed,
+            "Days": plan_days
+        }
+        if limits is not None:
+            result["NutrientLimits"] = limits.resolved
+        return result
 
-            # 8. Main Course - Dry Sabzis
-            if any(x in name for x in ["fry", "bharta", "jeera aloo", "gobi", "bhindi", "mix veg", "poriyal", "thoran", "sabzi", "saute", "methi", "palak", "bhurji", "chana"]):
-                return "Dry", "Lunch/Dinner"
-            
-            # Default fallback - Safer to assume Snack/Side if unknown, to avoid weird main courses
-            return "Snack", "Snack"
+    @metrics.timed("swap")
+    def swap_meal(self, age, weight, height, gender, activity_level, veg_preference, goal, plan, meal,
+                  k=DEFAULT_SWAP_OPTIONS, nutrients=None):
+        """Up to `k` replacements for one meal of `plan` (the "Plan" of a recommend() result).
 
-        # Rebuild dataframe with exploded rows for Lunch/Dinner
-        new_rows = []
-        
-        # Keywords to exclude (Ingredients, Raw items)
-        exclude_keywords = [
-            "powder", "masala", "flour", "oil", "seeds", "raw", "dough", "batter", 
-            "paste", "puree", "extract", "essence", "crushed", "dried", "flakes", 
-            "cubes", "slices", "chopped", "grated", "peeled", "whole", "split", 
-            "kernel", "pulp", "juice concentrate", "syrup", "sauce", "dip", 
-            "dressing", "vinegar", "yeast", "gelatin", "agar", "baking", "cooking",
-            "cream", "butter", "ghee", "cheese", "curd", "yogurt", "milk", "whey",
-            "sugar", "salt", "spice", "herb", "condiment", "pickle", "chutney",
-            "jam", "jelly", "marmalade", "preserve", "spread", "topping", "filling",
-            "frosting", "icing", "glaze", "coating", "batter", "mix", "base",
-            "stock", "broth", "bouillon", "cube", "granule", "concentrate"
-        ]
-        
-        # Exception list: Items that contain exclude keywords but are actual dishes
-        # e.g. "Paneer Butter Masala" contains "Masala" and "Butter" but is a dish.
-        # "Sambar Powder" is an ingredient, "Sambar" is a dish.
-        # We will filter based on if the name is *mostly* an ingredient.
-        
-        for _, row in df.iterrows():
-            name_lower = str(row['Name']).lower()
-            
-            # Skip if it's clearly an ingredient
-            if any(x in name_lower for x in ["powder", "flour", "oil", "seeds", "raw", "dough", "batter", "paste", "puree", "extract", "essence"]):
-                 # But allow specific dishes like "Paneer Butter Masala" or "Chana Masala"
-                 if "masala" in name_lower and not any(x in name_lower for x in ["paneer", "chicken", "chana", "rajma", "gobi", "bhindi", "aloo", "mushroom", "egg", "fish", "mutton"]):
-                     continue
-                 if "powder" in name_lower:
-                     continue
-                 if "flour" in name_lower:
-                     continue
-            
-            cat, meal_type = get_category_meal(row['Name'])
-            
-            meals = []
-            if meal_type == "Lunch/Dinner":
-                meals = ["Lunch", "Dinner"]
-            else:
-                meals = [meal_type]
-            
-            for m in meals:
-                new_row = row.copy()
-                new_row['Category'] = cat
-                new_row['Meal_Type'] = m
-                new_rows.append(new_row)
-        
-        df = pd.DataFrame(new_rows)
-        
-        # Ensure numeric columns are actually numeric
-        for col in ['Calories', 'Proteins', 'Fats', 'Carbs']:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-            
-        return df
-    
-    def calculate_bmr(self, weight, height, age, gender):
-        if gender.lower() == 'male':
-            return (10 * weight) + (6.25 * height) - (5 * age) + 5
-        else:
-            return (10 * weight) + (6.25 * height) - (5 * age) - 161
+        Only that slot is searched: alternatives are ranked against the calories
+        and macros the other meals leave of the day, and never reuse a dish
+        already in the plan.
+        """
+        if meal not in plan:
+            raise ValueError(f"Meal '{meal}' is not in the plan, expected one of {list(plan)}")
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        bmr, tdee, targets = self._energy_targets(age, weight, height, gender, activity_level, goal)
+        limits = None if nutrients is None else nutrition.daily_limits(nutrients, tdee, gender)
+        types = ('Veg',) if veg_preference == "Veg" else ('Veg', 'Non-Veg')
 
-    def calculate_tdee(self, bmr, activity_level, goal):
-        multipliers = {
-            "sedentary": 1.2, "light": 1.375, "moderate": 1.55,
-            "active": 1.725, "extra_active": 1.9
-        }
-        tdee = bmr * multipliers.get(activity_level, 1.2)
-        
-        if goal == "weight_loss":
-            # Target should be between BMR and TDEE-500
-            target = tdee - 500
-            tdee = max(bmr - 100, target) if target < bmr else target
-        elif goal == "weight_gain":
-            tdee += 300
-            
-        return max(1200, tdee)
+        others = [m for name, m in plan.items() if name != meal and m]
+        budget = {"Calories": tdee - sum(m['Calories'] for m in others)}
+        for macro, share in optimizer.MACRO_SPLIT.items():
+            budget[macro] = tdee * share / optimizer.KCAL_PER_GRAM[macro] - sum(m[macro] for m in others)
+        # Never aim below MIN_SWAP_SHARE of the meal's usual calories or macros
+        floor = targets[meal] * MIN_SWAP_SHARE
+        target = max(budget["Calories"], floor)
+        grams = {macro: max(budget[macro], floor * share / optimizer.KCAL_PER_GRAM[macro])
+                 for macro, share in optimizer.MACRO_SPLIT.items()}
 
-    def recommend(self, age, weight, height, gender, activity_level, veg_preference, goal):
-        bmr = self.calculate_bmr(weight, height, age, gender)
-        tdee = self.calculate_tdee(bmr, activity_level, goal)
-        
-        targets = {
-            "Breakfast": tdee * 0.25, "Lunch": tdee * 0.35,
-            "Dinner": tdee * 0.30, "Snack": tdee * 0.10
+        used = self.index.new_used_mask()
+        self._mark_plan(used, {name: m for name, m in plan.items() if m})
+        return {
+            "Meal": meal,
+            "Budget": {key: max(0, int(value)) for key, value in budget.items()},
+            "Alternatives": optimizer.alternatives(self, meal, target, grams, types, veg_preference, used, k, limits)
         }
-        
-        recommendations = {}
-        used_dishes = set()
-        
-        # Base filter for Veg/Non-Veg
-        base_df = self.df if veg_preference != "Veg" else self.df[self.df['Type'] == 'Veg']
-        
-        for meal, target in targets.items():
-            if meal in ["Lunch", "Dinner"]:
-                rec = self._recommend_lunch_dinner(meal, target, base_df, veg_preference, used_dishes)
-            elif meal == "Breakfast":
-                rec = self._recommend_breakfast(target, base_df, used_dishes)
-            else:
-                rec = self._recommend_simple(meal, target, base_df, used_dishes)
-            
-            if rec:
-                recommendations[meal] = rec
-                # Add main components to used list to avoid repetition
-                for part in rec['Name'].split(" + "):
-                    used_dishes.add(part.strip())
 
+    def search_dishes(self, query, limit=10, dish_type=None, meal_type=None):
+        """Dishes whose names best match `query` (typos allowed), with their nutrients."""
+        results = []
+        for code, score in self.search_index.search(query, limit, dish_type, meal_type):
+            row = self._row(self.search_index.first_row[code])
+            results.append({
+                "Name": row['Name'],
+                "Type": row['Type'],
+                "Category": row['Category'],
+                "Meal_Types": self.search_index.meal_types(code),
+                **{k: round(float(row[k]), 2) for k in catalogue.NUTRIENT_COLUMNS},
+                "Score": round(score, 3),
+            })
+        return results
+
+    @metrics.timed("targets")
+    def _energy_targets(self, age, weight, height, gender, activity_level, goal, precomputed=None):
+        if precomputed is None:
+            bmr = self.calculate_bmr(weight, height, age, gender)
+            tdee = self.calculate_tdee(bmr, activity_level, goal)
+        else:
+            bmr, tdee = precomputed
+        return bmr, tdee, energy.meal_targets(tdee)
+
+    @metrics.timed("score")
+    def _score_plan(self, recommendations, tdee, targets):
         total_cal = sum(m['Calories'] for m in recommendations.values() if m)
         
         # Calculate Accuracy (Total Calorie Match)
@@ -208,67 +287,101 @@ class DietRecommender:
             precision = max(0, 100 - (avg_deviation * 100))
 
         return {
-            "BMR": round(bmr, 2),
-            "TDEE": round(tdee, 2),
             "TotalCalories": int(total_cal),
             "Accuracy": round(accuracy, 2),
-            "Precision": round(precision, 2),
-            "Plan": recommendations
+            "Precision": round(precision, 2)
         }
 
-    def _get_meal_options(self, meal_type, base_df, used_dishes, veg_preference="Any"):
+    def _mark_plan(self, used, recommendations):
+        # Add main components to used list to avoid repetition
+        for rec in recommendations.values():
+            for part in rec['Name'].split(" + "):
+                self.index.mark_used(used, part.strip().removeprefix("2 servings of "))
+
+    @metrics.timed("greedy")
+    def _plan_greedy(self, targets, types, veg_preference, rng, used=None, limits=None):
+        # Fill each meal separately with the closest-calorie picks
+        recommendations = {}
+        used = self.index.new_used_mask() if used is None else used.copy()
+        
+        for meal, target in targets.items():
+            if meal in ["Lunch", "Dinner"]:
+                rec = self._recommend_lunch_dinner(meal, target, types, veg_preference, used, rng, limits)
+            elif meal == "Breakfast":
+                rec = self._recommend_breakfast(target, types, used, rng, limits)
+            else:
+                rec = self._recommend_simple(meal, target, types, used, limits)
+            
+            if rec:
+                recommendations[meal] = rec
+                self._mark_plan(used, {meal: rec})
+
+        return recommendations
+
+    @metrics.timed("meal_options")
+    def _get_meal_options(self, meal_type, types, used, veg_preference="Any"):
         # Filter by meal type and exclude used dishes
-        options = base_df[
-            (base_df['Meal_Type'] == meal_type) & 
-            (~base_df['Name'].isin(used_dishes))
-        ]
+        pool = MealPool(meal_type, types, used)
         
         # Fallback: if ran out of options, reuse dishes
-        if options.empty:
-            options = base_df[base_df['Meal_Type'] == meal_type]
+        if not self.index.available(pool):
+            pool = MealPool(meal_type, types, None)
+        if not self.index.available(pool):
+            return None
             
         # Prioritize Non-Veg if user is Non-Veg
         if veg_preference == "Non-Veg":
-            nv_options = options[options['Type'] == 'Non-Veg']
-            if not nv_options.empty:
-                return nv_options
+            nv_pool = pool._replace(types=('Non-Veg',))
+            if self.index.available(nv_pool):
+                return nv_pool
                 
-        return options
+        return pool
 
-    def _recommend_lunch_dinner(self, meal_type, target, base_df, veg_preference, used_dishes):
-        options = self._get_meal_options(meal_type, base_df, used_dishes, veg_preference)
-        if options.empty: return None
+    def _row(self, pos):
+        # A new dict per call: callers rename and rescale dishes in place
+        return dict(zip(ROW_KEYS, self.labels[pos].tolist() + self.nutrients[pos].tolist()))
+
+    @metrics.timed("lunch_dinner")
+    def _recommend_lunch_dinner(self, meal_type, target, types, veg_preference, used, rng, limits=None):
+        options = self._get_meal_options(meal_type, types, used, veg_preference)
+        if options is None: return None
         
         current_target = target
         side_dish = None
         
         # 1. Select Side Dish (80% chance)
-        # Filter for savory sides (exclude sweet drinks)
-        savory_sides = self.sides_df[self.sides_df['Name'].apply(lambda x: not any(s in str(x).lower() for s in ['shake', 'juice', 'coffee', 'tea']))]
-        if veg_preference == "Veg": 
-            savory_sides = savory_sides[savory_sides['Type'] == 'Veg']
+        # Savory sides (exclude sweet drinks), precomputed per preference
+        side_rows, side_calories, side_micros = self.side_pools["Veg" if veg_preference == "Veg" else "Any"]
+        if limits is not None:
+            # Only sides that keep the meal under its sodium/sugar share
+            fits = nutrition.within_caps(side_micros, target, limits)
+            side_rows, side_calories = side_rows[fits], side_calories[fits]
             
-        if not savory_sides.empty and random.random() < 0.8:
-            side_dish = savory_sides.sample(1).iloc[0].to_dict()
-            current_target -= side_dish['Calories']
+        if len(side_rows) and rng.random() < 0.8:
+            with metrics.stage("side"):
+                pick = rng.integers(len(side_rows))
+                side_dish = self._row(side_rows[pick])
+                current_target -= side_calories[pick]
 
         # 2. Select Main Dish Strategy: Complete Meal vs Curry + Staple
-        curries = options[options['Category'].isin(['Gravy', 'Dry'])]
-        complete = options[options['Category'].isin(['RiceSide', 'Complete'])]
+        curries = ['Gravy', 'Dry']
+        complete = ['RiceSide', 'Complete']
+        has_curries = self.index.available(options, curries)
+        has_complete = self.index.available(options, complete)
         
         # Default to Curry+Staple (70%), unless no curries available
         use_complete = False
-        if not complete.empty and (curries.empty or random.random() < 0.3):
+        if has_complete and (not has_curries or rng.random() < 0.3):
             use_complete = True
             
         main_dish = None
         staple_info = None
         extra_dish = None
         
-        if not use_complete and not curries.empty:
+        if not use_complete and has_curries:
             # --- Curry + Staple Logic ---
             main_target = current_target * 0.6
-            main_dish = self._find_closest(curries, main_target).to_dict()
+            main_dish = self._find_closest(options, main_target, curries, limits=limits)
             
             # Determine Staple (Rice or Chapati)
             remaining = current_target - main_dish['Calories']
@@ -285,64 +398,88 @@ class DietRecommender:
             # Check for large calorie deficit -> Add Extra Dish
             deficit = remaining - (qty * staple_cal)
             if deficit > 100:
-                extra_opts = options[options['Category'].isin(['RiceSide', 'Gravy', 'Dry'])]
-                extra_opts = extra_opts[extra_opts['Name'] != main_dish['Name']]
-                if not extra_opts.empty:
-                    extra_dish = self._find_closest(extra_opts, deficit).to_dict()
+                extra_dish = self._find_closest(options, deficit, ['RiceSide', 'Gravy', 'Dry'],
+                                                exclude=main_dish['Name'], limits=limits)
         else:
             # --- Complete Meal Logic ---
-            pool = complete if not complete.empty else options
-            main_dish = self._find_closest(pool, current_target).to_dict()
+            pool = complete if has_complete else None
+            main_dish = self._find_closest(options, current_target, pool, limits=limits)
             
             # Scale up if portion is too small (< 60% of target)
             if main_dish['Calories'] < current_target * 0.6:
                 main_dish['Name'] = f"2 servings of {main_dish['Name']}"
-                for k in ['Calories', 'Proteins', 'Fats', 'Carbs']: 
+                for k in catalogue.NUTRIENT_COLUMNS:
                     main_dish[k] *= 2
 
         return self._format_meal(main_dish, staple_info, side_dish, extra_dish, meal_type)
 
-    def _recommend_breakfast(self, target, base_df, used_dishes):
-        options = self._get_meal_options("Breakfast", base_df, used_dishes)
-        if options.empty: return None
+    @metrics.timed("breakfast")
+    def _recommend_breakfast(self, target, types, used, rng, limits=None):
+        options = self._get_meal_options("Breakfast", types, used)
+        if options is None: return None
         
         # Pick random option close to target (minus buffer for potential side)
         target_search = max(200, target - 150)
-        X = options[['Calories']].values
-        nbrs = NearestNeighbors(n_neighbors=min(10, len(options)), algorithm='ball_tree').fit(X)
-        indices = nbrs.kneighbors([[target_search]])[1][0]
-        main_dish = options.iloc[random.choice(indices)].to_dict()
+        indices = self.index.k_nearest(options, target_search, 10)
+        if limits is None:
+            main_dish = self._row(rng.choice(indices))
+        else:
+            stats = self._nutrients_at(indices)
+            costs = nutrition.meal_costs(stats[:, 0], stats[:, MACRO_COUNT:], target_search, limits)
+            main_dish = self._row(indices[np.argmin(costs)])
         
         # Check for pairings (e.g. Idli + Sambar)
         side_dish = self._find_pairing(main_dish['Name'])
         
         return self._format_meal(main_dish, None, side_dish, None, "Breakfast")
 
-    def _recommend_simple(self, meal_type, target, base_df, used_dishes):
-        options = self._get_meal_options(meal_type, base_df, used_dishes)
-        if options.empty: return None
+    @metrics.timed("simple")
+    def _recommend_simple(self, meal_type, target, types, used, limits=None):
+        options = self._get_meal_options(meal_type, types, used)
+        if options is None: return None
         
-        main_dish = self._find_closest(options, target).to_dict()
+        main_dish = self._find_closest(options, target, limits=limits)
         return self._format_meal(main_dish, None, None, None, meal_type)
 
+    def _pairing_rows(self, names):
+        """Dish position of the pairing side for each dish name, or -1 for none."""
+        lower = names.astype(str).str.lower()
+        catalogue_names = pd.Series(self.names, dtype=object).astype(str).str.lower()
+        calories = self.calories
+        rows = np.full(len(names), -1, dtype=np.int64)
+        decided = np.zeros(len(names), dtype=bool)
+        for key, sides in self.pairings.items():
+            has_key = lower.str.contains(key.lower(), regex=False).to_numpy() & ~decided
+            if not has_key.any():
+                continue
+            # Already has side
+            has_side = np.zeros(len(names), dtype=bool)
+            for s in sides:
+                has_side |= lower.str.contains(s.lower(), regex=False).to_numpy()
+            decided |= has_key & has_side
+            # Lowest-calorie catalogue dish matching the first side that exists
+            for s in sides:
+                matches = np.flatnonzero(catalogue_names.str.contains(s.lower(), regex=False).to_numpy())
+                if len(matches):
+                    pick = has_key & ~has_side
+                    rows[pick] = matches[np.argmin(calories[matches])]
+                    decided |= pick
+                    break
+        return rows
+
+    @metrics.timed("pairing")
     def _find_pairing(self, dish_name):
-        pairings = {
-            "Bhatura": ["Chole", "Chickpeas"], "Poori": ["Aloo", "Potato"],
-            "Idli": ["Sambar", "Chutney"], "Dosa": ["Sambar", "Chutney"],
-            "Paratha": ["Curd", "Yogurt"], "Roti": ["Dal", "Sabzi"]
-        }
-        for key, sides in pairings.items():
-            if key.lower() in dish_name.lower():
-                if any(s.lower() in dish_name.lower() for s in sides): return None # Already has side
-                
-                for s in sides:
-                    matches = self.df[self.df['Name'].str.contains(s, case=False)]
-                    if not matches.empty:
-                        return matches.sort_values('Calories').iloc[0].to_dict()
-        return None
+        row = self.pairing_map.get(dish_name)
+        if row is None and dish_name not in self.index.name_lookup:
+            # Not a catalogue dish: evaluate the rules for this one name
+            row = int(self._pairing_rows(pd.Series([dish_name], dtype=object))[0])
+        if row is None or row < 0:
+            return None
+        return self._row(row)
 
+    @metrics.timed("format")
     def _format_meal(self, main, staple, side, extra, meal_type):
-        total_stats = {k: main[k] for k in ['Calories', 'Proteins', 'Fats', 'Carbs']}
+        total_stats = {k: main[k] for k in catalogue.NUTRIENT_COLUMNS}
         name_parts = [main['Name']]
         
         if staple:
@@ -354,7 +491,8 @@ class DietRecommender:
             else:
                  name_parts.append(qty_str + (" " + s_name if "Rice" in s_name else ""))
             
-            for k in total_stats: total_stats[k] += staple['Qty'] * staple['Stats'][k]
+            # Staples carry macros only; their micronutrients count as 0
+            for k in total_stats: total_stats[k] += staple['Qty'] * staple['Stats'].get(k, 0)
             
         if extra:
             name_parts.append(extra['Name'])
@@ -369,11 +507,22 @@ class DietRecommender:
             "Type": main['Type'],
             "Meal_Type": meal_type,
             "Category": main.get('Category', 'Unknown'),
-            **{k: int(v) for k, v in total_stats.items()}
+            **{k: int(total_stats[k]) for k in ['Calories', 'Proteins', 'Fats', 'Carbs']},
+            **{k: round(float(total_stats[k]), 1) for k in catalogue.MICRONUTRIENT_COLUMNS}
         }
 
-    def _find_closest(self, df, target_cal):
-        X = df[['Calories']].values
-        nbrs = NearestNeighbors(n_neighbors=1, algorithm='ball_tree').fit(X)
-        distances, indices = nbrs.kneighbors([[target_cal]])
-        return df.iloc[indices[0][0]]
+    @metrics.timed("find_closest")
+    def _find_closest(self, pool, target_cal, categories=None, exclude=None, limits=None):
+        if exclude is not None:
+            exclude = self.index.name_lookup.get(exclude)
+        if limits is None:
+            pos = self.index.nearest(pool, target_cal, categories, exclude)
+        else:
+            # Best calorie + micronutrient trade-off among the calorie-nearest dishes
+            positions = self.index.k_nearest(pool, target_cal, NUTRIENT_CANDIDATES, categories, exclude)
+            stats = self._nutrients_at(positions)
+            costs = nutrition.meal_costs(stats[:, 0], stats[:, MACRO_COUNT:], target_cal, limits)
+            pos = positions[np.argmin(costs)] if len(positions) else None
+        if pos is None:
+            return None
+        return self._row(pos)
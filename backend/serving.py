@@ -0,0 +1,91 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import batch
+
+# Off-event-loop execution for /recommend. Greedy plans are a few index
+# lookups and run on a thread pool; the optimal engine can go to a process
+# pool (RECOMMEND_PROCESSES > 0) so its numpy/pandas work is not bound by
+# this process's GIL. Both share one bound on in-flight calls so overload
+# turns into fast 503s instead of an ever-growing queue.
+
+DEFAULT_MAX_PENDING = 64
+DEFAULT_TIMEOUT_S = 10.0
+PROFILE_FIELDS = ["age", "weight", "height", "gender", "activity", "preference", "goal"]
+
+
+class Overloaded(Exception):
+    pass
+
+
+class RecommendExecutor:
+    """Runs recommend() calls off the event loop with backpressure and timeouts.
+
+    A call counts as pending from submission until its worker actually
+    finishes, even if the caller already timed out, so the bound reflects
+    real load on the pools.
+    """
+
+    def __init__(self, data_path, threads=None, processes=0, max_pending=DEFAULT_MAX_PENDING,
+                 timeout=DEFAULT_TIMEOUT_S):
+        self.data_path = data_path
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="recommend")
+        self.processes = batch.new_pool(data_path, processes) if processes > 0 else None
+        self.pending = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise Overloaded()
+            self.pending += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.pending -= 1
+
+    def _submit(self, snapshot, profile, seed, engine, nutrients):
+        if engine == "optimal" and self.processes is not None:
+            job = (dict(zip(PROFILE_FIELDS, profile), engine=engine, nutrients=nutrients), seed, snapshot.version)
+            return self.processes.submit(batch.recommend_one, job)
+        # Carry the request context over so stage timings reach the caller
+        context = contextvars.copy_context()
+        return self.threads.submit(context.run, snapshot.recommender.recommend, *profile, seed=seed, engine=engine,
+                                   nutrients=nutrients)
+
+    async def recommend(self, snapshot, profile, seed=None, engine="greedy", nutrients=None):
+        """Plan for one profile tuple; raises Overloaded or asyncio.TimeoutError."""
+        self._acquire()
+        try:
+            future = self._submit(snapshot, profile, seed, engine, nutrients)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            # Drop it if it has not started yet; a running call finishes in the background
+            future.cancel()
+            raise
+
+    def shutdown(self):
+        self.threads.shutdown(wait=False, cancel_futures=True)
+        if self.processes is not None:
+            self.processes.shutdown(wait=False, cancel_futures=True)
+
+
+def from_env(data_path):
+    threads = os.environ.get("RECOMMEND_THREADS")
+    return RecommendExecutor(
+        data_path,
+        threads=int(threads) if threads else None,
+        processes=int(os.environ.get("RECOMMEND_PROCESSES", 0)),
+        max_pending=int(os.environ.get("RECOMMEND_MAX_PENDING", DEFAULT_MAX_PENDING)),
+        timeout=float(os.environ.get("RECOMMEND_TIMEOUT", DEFAULT_TIMEOUT_S)),
+    )
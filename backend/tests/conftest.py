@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The backend modules import each other by plain name, as when run from backend/
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from conftest import BACKEND
+
+PROFILE = {"age": 30, "weight": 70, "height": 175, "gender": "male", "activity": "moderate",
+           "preference": "Veg", "goal": "maintenance", "seed": 1}
+
+
+@pytest.fixture(scope="module")
+def client():
+    # main resolves its data files relative to the backend directory
+    cwd = os.getcwd()
+    os.chdir(BACKEND)
+    try:
+        with TestClient(main.app) as client:
+            yield client
+    finally:
+        os.chdir(cwd)
+
+
+def test_plan_token_only_when_asked(client):
+    before = len(main.tokens.backend)
+    plan = client.post("/recommend", json=PROFILE).json()
+    assert "PlanToken" not in plan
+    assert len(main.tokens.backend) == before
+
+    plan = client.post("/recommend", json={**PROFILE, "plan_token": True}).json()
+    swap = client.post("/recommend/swap", json={"token": plan["PlanToken"], "meal": "Lunch"})
+    assert swap.status_code == 200
+    assert swap.json()["Meal"] == "Lunch"
+
+
+@pytest.mark.parametrize("repeat_window", [-1, main.MAX_PLAN_DAYS + 1, 10**20])
+def test_range_rejects_out_of_bounds_repeat_window(client, repeat_window):
+    response = client.post("/recommend/range", json={**PROFILE, "days": 3, "repeat_window": repeat_window})
+    assert response.status_code == 422
+
+
+def test_range_never_repeats_within_a_window_longer_than_the_plan(client):
+    response = client.post("/recommend/range", json={**PROFILE, "days": 4, "repeat_window": main.MAX_PLAN_DAYS})
+    assert response.status_code == 200
+    mains = [meal["Name"] for day in response.json()["Days"] for meal in day["Plan"].values()]
+    assert len(mains) == len(set(mains))
+
+
+def test_shutdown_stops_the_batch_pool(monkeypatch):
+    import batch
+    monkeypatch.setenv("BATCH_WORKERS", "1")
+    monkeypatch.chdir(BACKEND)
+    with TestClient(main.app) as client:
+        response = client.post("/recommend/batch", json={"profiles": [PROFILE, PROFILE]})
+        assert response.status_code == 200
+        assert len(response.text.splitlines()) == 2
+        assert batch._pool is not None
+        processes = list(batch._pool._processes.values())
+    assert batch._pool is None
+    assert processes
+    for process in processes:
+        process.join(timeout=10)
+    assert not any(process.is_alive() for process in processes)
@@ -0,0 +1,25 @@
+import os
+
+import pandas as pd
+
+import batch
+import catalogue
+from conftest import BACKEND
+
+PROCESSED_PATH = os.path.join(BACKEND, "food_data_processed.csv")
+PROFILE = {"age": 30, "weight": 70, "height": 175, "gender": "male", "activity": "moderate",
+           "preference": "Veg", "goal": "maintenance"}
+
+
+def test_worker_labels_a_reload_with_the_files_it_loaded(tmp_path):
+    path = str(tmp_path / "food.catalog")
+    df = pd.read_csv(PROCESSED_PATH)
+    catalogue.write_catalogue(df, path)
+    batch._init_worker(path)
+    first = batch._worker_version
+
+    # Two reloads land before the worker sees a job tagged with the first of them
+    catalogue.write_catalogue(df.iloc[:-1], path)
+    catalogue.write_catalogue(df.iloc[:-2], path)
+    batch.recommend_one((PROFILE, 1, "version of the first reload"))
+    assert batch._worker_version == catalogue.content_version(path) != first
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import catalogue
+from calorie_index import CalorieIndex, MealPool
+
+MEALS = ["Breakfast", "Lunch", "Dinner", "Snack"]
+TYPE_CHOICES = [("Veg",), ("Veg", "Non-Veg"), ("Non-Veg",)]
+CATEGORIES = ["Gravy", "Dry", "Complete", "Snack"]
+
+
+def _dishes(seed=0, n=300):
+    # Random exploded catalogue; some names repeat so used masks hit several records
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n):
+        name = f"dish {rng.integers(n // 2)}"
+        dish = {"Name": name, "Type": str(rng.choice(["Veg", "Non-Veg"])),
+                "Category": str(rng.choice(CATEGORIES)),
+                **{col: round(float(rng.uniform(0, 900)), 2) for col in catalogue.NUTRIENT_COLUMNS}}
+        for meal in rng.choice(MEALS, size=int(rng.integers(1, 3)), replace=False):
+            rows.append({**dish, "Meal_Type": str(meal)})
+    return catalogue.dishes_from_frame(pd.DataFrame(rows))
+
+
+def _brute_force(dishes, index, pool, categories, exclude):
+    """Dish positions the pool allows, and their calorie distances, by scanning every dish."""
+    bit = 1 << catalogue.MEAL_TYPES.index(pool.meal_type)
+    types = np.array(dishes.types)[dishes.type_codes]
+    cats = np.array(dishes.categories)[dishes.category_codes]
+    ok = ((dishes.meals & bit) > 0) & np.isin(types, pool.types)
+    if categories is not None:
+        ok &= np.isin(cats, categories)
+    ok &= index.name_codes != (-1 if exclude is None else exclude)
+    if pool.used is not None:
+        ok &= ~pool.used[index.name_codes]
+    return np.flatnonzero(ok)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_lookups_match_brute_force(seed):
+    dishes = _dishes(seed)
+    index = CalorieIndex(dishes)
+    rng = np.random.default_rng(seed + 100)
+    calories = dishes.nutrients[:, 0]
+    for _ in range(200):
+        used = rng.random(len(index.names)) < rng.choice([0, 0.3, 0.9])
+        pool = MealPool(str(rng.choice(MEALS)), TYPE_CHOICES[rng.integers(len(TYPE_CHOICES))],
+                        used if rng.random() < 0.8 else None)
+        categories = None if rng.random() < 0.5 else list(rng.choice(CATEGORIES, size=2, replace=False))
+        exclude = None if rng.random() < 0.5 else int(rng.integers(len(index.names)))
+        target = float(rng.uniform(-50, 1000))
+        k = int(rng.integers(1, 15))
+
+        allowed = _brute_force(dishes, index, pool, categories, exclude)
+        distances = np.sort(np.abs(calories[allowed] - target))
+
+        assert index.available(pool, categories, exclude) == bool(len(allowed))
+        nearest = index.nearest(pool, target, categories, exclude)
+        if len(allowed):
+            assert nearest in allowed
+            assert abs(calories[nearest] - target) == distances[0]
+        else:
+            assert nearest is None
+
+        found = index.k_nearest(pool, target, k, categories, exclude)
+        assert set(found) <= set(allowed)
+        assert len(set(found)) == len(found) == min(k, len(allowed))
+        # Nearest first, and no closer dish left out
+        np.testing.assert_array_equal(np.abs(calories[found] - target), distances[:len(found)])
+
+
+def test_empty_buckets():
+    dishes = _dishes()
+    index = CalorieIndex(dishes)
+    # Side has no dishes in this catalogue; a category it lacks is an empty bucket too
+    for pool, categories in [(MealPool("Side", ("Veg", "Non-Veg"), None), None),
+                             (MealPool("Lunch", ("Veg",), None), ["Beverage"])]:
+        assert not index.available(pool, categories)
+        assert index.nearest(pool, 300, categories) is None
+        assert len(index.k_nearest(pool, 300, 5, categories)) == 0
+    # Every dish used
+    used = np.ones(len(index.names), dtype=bool)
+    pool = MealPool("Lunch", ("Veg", "Non-Veg"), used)
+    assert index.nearest(pool, 300) is None
+    assert len(index.k_nearest(pool, 300, 5)) == 0
@@ -0,0 +1,112 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import catalogue
+from conftest import BACKEND
+from recommender import DietRecommender
+
+PROCESSED_PATH = os.path.join(BACKEND, "food_data_processed.csv")
+PROFILES = [
+    (30, 70, 175, "male", "moderate", "Veg", "maintenance"),
+    (78, 75.86, 123.69, "female", "sedentary", "Veg", "weight_loss"),
+    (45, 92.5, 181, "male", "very_active", "Non-Veg", "weight_gain"),
+]
+
+
+def _frame():
+    rows = [
+        ("Masala Dosa", "Veg", "Breakfast", "Complete"),
+        ("Paneer Butter Masala", "Veg", "Lunch", "Gravy"),
+        ("Paneer Butter Masala", "Veg", "Dinner", "Gravy"),
+        ("Chicken Curry", "Non-Veg", "Lunch", "Gravy"),
+        ("Chicken Curry", "Non-Veg", "Dinner", "Gravy"),
+        ("Boondi Raita", "Veg", "Side", "Side"),
+        ("Masala Chai", "Veg", "Snack", "Beverage"),
+        ("Crème caramel ☕", "Veg", "Snack", "Snack"),
+    ]
+    df = pd.DataFrame(rows, columns=["Name", "Type", "Meal_Type", "Category"])
+    rng = np.random.default_rng(0)
+    for col in catalogue.NUTRIENT_COLUMNS:
+        # Same nutrients on both rows of a Lunch/Dinner dish, as finalize() writes them
+        per_dish = pd.Series(rng.uniform(0, 500, df["Name"].nunique()).round(2), index=df["Name"].unique())
+        df[col] = df["Name"].map(per_dish)
+    return df[["Name", "Type", *catalogue.NUTRIENT_COLUMNS, "Meal_Type", "Category"]]
+
+
+def _canonical(df):
+    df = df.astype({"Type": str, "Meal_Type": str, "Category": str})
+    return df.sort_values(["Name", "Meal_Type"]).reset_index(drop=True)
+
+
+def test_round_trip_expands_the_meal_bitmask(tmp_path):
+    df = _frame()
+    path = str(tmp_path / "food.catalog")
+    catalogue.write_catalogue(df, path)
+
+    dishes = catalogue.load_dishes(path)
+    # Lunch/Dinner dishes are stored once, with both bits set
+    assert len(dishes.names) == df["Name"].nunique()
+    lunch_dinner = (1 << catalogue.MEAL_TYPES.index("Lunch")) | (1 << catalogue.MEAL_TYPES.index("Dinner"))
+    assert dishes.meals[list(dishes.names).index("Chicken Curry")] == lunch_dinner
+    assert isinstance(dishes.nutrients, np.memmap) and isinstance(dishes.meals, np.memmap)
+
+    # Nutrients read back exactly, not rounded through float32
+    pd.testing.assert_frame_equal(_canonical(catalogue.load_catalogue(path)), _canonical(df), check_dtype=False)
+
+
+def test_chunked_writer_matches_one_shot(tmp_path):
+    df = _frame()
+    catalogue.write_catalogue(df, str(tmp_path / "one.catalog"))
+    with catalogue.CatalogueWriter(str(tmp_path / "chunked.catalog")) as writer:
+        # Split between a dish's Lunch and Dinner rows; the chunks hold different dishes otherwise
+        writer.append(df.iloc[:2])
+        writer.append(df.iloc[3:])
+    one = catalogue.load_catalogue(str(tmp_path / "one.catalog"))
+    chunked = catalogue.load_catalogue(str(tmp_path / "chunked.catalog"))
+    assert len(chunked) == len(one) - 1
+    pd.testing.assert_frame_equal(_canonical(chunked), _canonical(one.drop(index=one.index[
+        (one["Name"] == "Paneer Butter Masala") & (one["Meal_Type"] == "Dinner")])))
+
+
+def test_dishes_from_frame_matches_a_written_catalogue(tmp_path):
+    df = _frame()
+    path = str(tmp_path / "food.catalog")
+    catalogue.write_catalogue(df, path)
+    stored = catalogue.load_dishes(path)
+    built = catalogue.dishes_from_frame(df)
+    assert list(built.names) == list(stored.names)
+    assert (built.types, built.categories) == (stored.types, stored.categories)
+    np.testing.assert_array_equal(built.type_codes, stored.type_codes)
+    np.testing.assert_array_equal(built.category_codes, stored.category_codes)
+    np.testing.assert_array_equal(built.meals, stored.meals)
+    np.testing.assert_array_equal(built.nutrients, stored.nutrients)
+
+
+def test_unknown_meal_type_is_rejected(tmp_path):
+    df = _frame().assign(Meal_Type="Brunch")
+    with pytest.raises(ValueError, match="Unknown Meal_Type"):
+        catalogue.write_catalogue(df, str(tmp_path / "food.catalog"))
+    assert not (tmp_path / "food.catalog").exists()
+
+
+def test_catalogue_plans_match_csv_plans(tmp_path):
+    path = str(tmp_path / "food.catalog")
+    catalogue.write_catalogue(pd.read_csv(PROCESSED_PATH), path)
+    from_catalogue, from_csv = DietRecommender(data_path=path), DietRecommender(data_path=PROCESSED_PATH)
+    # The optimal engine draws nothing at random: one seed covers it
+    cases = [{"seed": seed, "nutrients": nutrients} for seed in range(50) for nutrients in [None, {}]]
+    cases.append({"engine": "optimal"})
+    for profile in PROFILES:
+        for kwargs in cases:
+            assert from_catalogue.recommend(*profile, **kwargs)["Plan"] == from_csv.recommend(*profile, **kwargs)["Plan"]
+
+
+def test_missing_names_are_written_as_nan(tmp_path):
+    df = _frame()
+    df.loc[0, "Name"] = np.nan
+    path = str(tmp_path / "food.catalog")
+    catalogue.write_catalogue(df, path)
+    assert "nan" in list(catalogue.load_dishes(path).names)
@@ -0,0 +1,62 @@
+import os
+import shutil
+
+import pandas as pd
+
+import catalogue
+import process_dataset
+from catalogue_store import CatalogueStore
+from conftest import BACKEND
+from recommender import DietRecommender
+
+RAW_PATH = os.path.join(BACKEND, "Indian_Food_Nutrition_Processed.csv")
+PROFILE = (30, 70, 175, "male", "moderate", "Any", "maintenance")
+
+
+def test_reload_after_an_edited_row_matches_a_full_reprocess(tmp_path):
+    raw = str(tmp_path / "raw.csv")
+    shutil.copy(RAW_PATH, raw)
+    processed, catalogue_path = str(tmp_path / "processed.csv"), str(tmp_path / "food.catalog")
+    process_dataset.preprocess_new_dataset(raw, processed, catalogue_path)
+    store = CatalogueStore(raw, processed, catalogue_path, catalogue_path)
+    before = store.current.version
+
+    # Rename a drink into a non-veg main and change its calories
+    df = pd.read_csv(raw)
+    df.loc[1, ["Dish Name", "Calories (kcal)"]] = ["Chicken Biryani Special", 612.5]
+    df.to_csv(raw, index=False)
+    result = store.reload()
+    assert (result["reclassified"], result["removed"], result["rows"]) == (1, 1, len(df))
+    assert store.current.version != before
+
+    full_processed, full_catalogue = str(tmp_path / "full.csv"), str(tmp_path / "full.catalog")
+    process_dataset.preprocess_new_dataset(raw, full_processed, full_catalogue)
+    with open(processed, "rb") as a, open(full_processed, "rb") as b:
+        assert a.read() == b.read()
+    assert store.current.version == catalogue.content_version(full_catalogue)
+    full = DietRecommender(data_path=full_catalogue)
+    for seed in range(5):
+        assert store.current.recommender.recommend(*PROFILE, seed=seed) == full.recommend(*PROFILE, seed=seed)
+
+    # Nothing changed since: no work, same snapshot
+    assert store.reload()["reclassified"] == 0
+
+
+def test_reload_picks_up_raw_edits_made_before_startup(tmp_path):
+    raw = str(tmp_path / "raw.csv")
+    shutil.copy(RAW_PATH, raw)
+    processed, catalogue_path = str(tmp_path / "processed.csv"), str(tmp_path / "food.catalog")
+    process_dataset.preprocess_new_dataset(raw, processed, catalogue_path)
+
+    # Edited while the API was down: the catalogue on disk is now stale
+    df = pd.read_csv(raw)
+    df.loc[0, "Dish Name"] = "Chicken Biryani Special"
+    df.to_csv(raw, index=False)
+    store = CatalogueStore(raw, processed, catalogue_path, catalogue_path)
+    assert "Chicken Biryani Special" not in store.current.recommender.names
+
+    result = store.reload()
+    assert result["reclassified"] == len(df)
+    assert "Chicken Biryani Special" in store.current.recommender.names
+    assert catalogue.catalogue_source(catalogue_path) == process_dataset.content_hash(raw)
+    assert store.reload()["reclassified"] == 0
@@ -0,0 +1,46 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import energy
+
+GENDERS = ["male", "Male", "female", "other", None]
+ACTIVITIES = list(energy.ACTIVITY_MULTIPLIERS) + ["unknown"]
+GOALS = ["weight_loss", "maintenance", "weight_gain", "unknown"]
+
+
+def _profiles():
+    # Every label combination, with body sizes that cover the MIN_CALORIES
+    # floor and both branches of the weight-loss rule
+    rng = np.random.default_rng(0)
+    rows = [{"age": int(rng.integers(15, 90)), "weight": round(float(rng.uniform(35, 160)), 1),
+             "height": round(float(rng.uniform(140, 205)), 1), "gender": gender, "activity": activity,
+             "goal": goal}
+            for gender, activity, goal in itertools.product(GENDERS, ACTIVITIES, GOALS) for _ in range(5)]
+    return pd.DataFrame(rows)
+
+
+def _scalar(row):
+    bmr = energy.bmr(row.weight, row.height, row.age, row.gender)
+    tdee = energy.tdee(bmr, row.activity, row.goal)
+    return {"BMR": bmr, "TDEE": tdee, **energy.meal_targets(tdee)}
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+def test_profile_energy_matches_scalar_results_exactly(categorical):
+    profiles = _profiles()
+    if categorical:
+        profiles = profiles.astype({"gender": "category", "activity": "category", "goal": "category"})
+    expected = pd.DataFrame([_scalar(row) for row in profiles.itertuples()], index=profiles.index)
+    result = energy.profile_energy(profiles)
+    assert list(result.columns) == list(expected.columns)
+    # Exact equality, not a tolerance: batch and single-profile plans must see the same targets
+    assert (result.to_numpy() == expected.to_numpy()).all()
+
+
+def test_scalar_inputs_stay_python_numbers():
+    bmr = energy.bmr(70, 175, 30, "male")
+    tdee = energy.tdee(bmr, "moderate", "weight_loss")
+    assert type(bmr) is float and type(tdee) is float
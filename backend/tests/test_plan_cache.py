@@ -0,0 +1,18 @@
+import plan_cache
+
+
+def test_sqlite_backend_trims_to_max_entries_and_drops_expired(tmp_path, monkeypatch):
+    backend = plan_cache.SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries=10, ttl=3600)
+    for i in range(plan_cache.TRIM_EVERY):
+        backend.set(f"k{i}", "v1", {"i": i})
+    # The trim on the last write keeps only the most recent max_entries
+    assert len(backend) == 10
+    assert backend.get(f"k{plan_cache.TRIM_EVERY - 1}", "v1") == {"i": plan_cache.TRIM_EVERY - 1}
+    assert backend.get("k0", "v1") is None
+    # Entries of another catalogue version never answer
+    assert backend.get(f"k{plan_cache.TRIM_EVERY - 1}", "v2") is None
+
+    now = plan_cache.time.time()
+    monkeypatch.setattr(plan_cache.time, "time", lambda: now + 7200)
+    backend.set("fresh", "v1", {})
+    assert len(backend) == 1
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import catalogue
+import process_dataset
+from conftest import BACKEND
+
+RAW_PATH = os.path.join(BACKEND, "Indian_Food_Nutrition_Processed.csv")
+PROCESSED_PATH = os.path.join(BACKEND, "food_data_processed.csv")
+
+
+@pytest.mark.parametrize("chunk_rows", [None, 100])
+def test_output_matches_shipped_processed_csv(tmp_path, chunk_rows):
+    # The vectorised classifier (whole file or streamed in chunks) must reproduce the shipped file byte for byte
+    out = tmp_path / "processed.csv"
+    process_dataset.preprocess_new_dataset(RAW_PATH, str(out), chunk_rows=chunk_rows)
+    with open(PROCESSED_PATH, "rb") as f:
+        assert out.read_bytes() == f.read()
+
+
+def test_datasets_without_micronutrients_get_zeros(tmp_path):
+    raw = tmp_path / "raw.csv"
+    raw.write_text("Dish Name,Calories (kcal),Carbohydrates (g),Protein (g),Fats (g)\n"
+                   "Idli,58.0,12.0,2.0,0.2\nPaneer Butter Masala,300.0,10.0,12.0,22.0\n")
+    out = tmp_path / "processed.csv"
+    process_dataset.preprocess_new_dataset(str(raw), str(out))
+    df = pd.read_csv(out)
+    assert list(df.columns) == process_dataset.FINAL_COLS
+    assert (df[catalogue.MICRONUTRIENT_COLUMNS] == 0).all().all()
+
+
+def test_missing_names_are_classified_as_their_text():
+    names = pd.Series(["Chicken Curry", np.nan, None, "Idli"], dtype=object)
+    dish_type, category, meal_type = process_dataset.classify_dishes(names)
+    # Not the labels of a neighbouring name: "nan" and "none" match no keyword
+    assert list(dish_type) == ["Non-Veg", "Veg", "Veg", "Veg"]
+    assert list(category) == ["Gravy", "Snack", "Snack", "Breakfast"]
+    assert list(meal_type) == ["Lunch/Dinner", "Snack", "Snack", "Breakfast"]
+
+
+def test_artifact_cleanup_spares_sibling_datasets(tmp_path):
+    raw = tmp_path / "foo.csv"
+    raw.write_text("Dish Name,Calories (kcal)\nIdli,58\n")
+    sibling = tmp_path / "foo.bar.0123456789abcdef.classified.csv"
+    sibling.write_text("Type,Category,Meal_Type\n")
+    stale = tmp_path / "foo.fedcba9876543210.classified.csv"
+    stale.write_text("Type,Category,Meal_Type\n")
+    process_dataset.classify_cached(str(raw))
+    assert sibling.exists()
+    assert not stale.exists()
+    assert len(list(tmp_path.glob("foo.*.classified.csv"))) == 2